@@ -11,7 +11,14 @@ with open('README.rst') as readme_file:
 with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
-requirements = ['requests', 'six']
+requirements = ['requests', 'six', 'futures; python_version < "3.0"']
+
+extra_requirements = {
+    'http2': ['httpx[http2]'],
+    'arrow': ['pyarrow'],
+    'numpy': ['numpy'],
+    'otel': ['opentelemetry-api'],
+}
 
 setup_requirements = ['pytest-runner', ]
 
@@ -35,6 +42,7 @@ setup(
     ],
     description="a python client library for whispir.io",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
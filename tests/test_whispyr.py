@@ -2,8 +2,65 @@
 
 """Tests for `whispyr` package"""
 
+import subprocess
+import sys
+
+import pytest
+
 import whispyr
+from whispyr.whispyr import Container, _page_params
 
 
 def test_version():
     assert whispyr.__version__ == '0.3.0'
+
+
+@pytest.mark.parametrize('uri, expected', [
+    ('https://api.whispir.com/workspaces/B6302F7C7B9A8982',
+     'B6302F7C7B9A8982'),
+    ('https://api.whispir.com/workspaces/B6/contacts/3CB707093288E45E',
+     '3CB707093288E45E'),
+    ('https://api.whispir.com/messages/09CD9065116DF39F?apikey=K#top',
+     '09CD9065116DF39F'),
+])
+def test_id_from_uri(uri, expected):
+    assert Container.id_from_uri(uri) == expected
+
+
+def test_id_from_links():
+    links = [
+        {'rel': 'next', 'uri': 'https://api.whispir.com/contacts/NEXT'},
+        {'rel': 'self', 'uri': 'https://api.whispir.com/contacts/SELF'},
+    ]
+    assert Container.id_from_links(links) == 'SELF'
+    assert Container.id_from_links([]) is None
+
+
+@pytest.mark.parametrize('uri', [
+    'https://api.whispir.com/contacts?limit=20&offset=40',
+    'https://api.whispir.com/contacts?offset=40&foo=bar&limit=20',
+])
+def test_page_params(uri):
+    assert _page_params(uri) == {'limit': '20', 'offset': '40'}
+
+
+def test_import_does_not_load_optional_modules():
+    optional = ['concurrent.futures', 'httpx', 'pyarrow', 'numpy', 'sqlite3']
+    code = ('import sys, whispyr; '
+            'print(",".join(m for m in {!r} if m in sys.modules))')
+    output = subprocess.check_output(
+        [sys.executable, '-c', code.format(optional)])
+    assert output.strip() == b''
+
+
+def test_collections_are_created_lazily():
+    whispir = whispyr.Whispir('username', 'password', 'api key')
+    assert 'messages' not in vars(whispir)
+    messages = whispir.messages
+    assert whispir.messages is messages
+    assert isinstance(messages, whispyr.whispyr.Messages)
+
+    message = messages.Message(id='M1')
+    assert isinstance(message, whispyr.Message)
+    assert message.statuses is message.statuses
+    assert message.statuses.path() == 'messages/M1/messagestatus'
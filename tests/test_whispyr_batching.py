@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` recipient batching"""
+
+import itertools
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import Message
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY)
+
+
+@pytest.fixture
+def sent():
+    sent = []
+    ids = itertools.count()
+
+    def create_message(request, uri, headers):
+        sent.append(json.loads(request.body.decode('utf-8')))
+        location = 'https://api.whispir.com/messages/M{}'.format(next(ids))
+        headers['Location'] = location
+        return 202, headers, 'Your request has been accepted for processing'
+
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'), body=create_message)
+    return sent
+
+
+def test_send_many_collapses_recipients(whispir, sent):
+    payloads = [
+        {'to': 'a@example.com', 'subject': 'hi', 'body': 'one'},
+        {'to': 'b@example.com', 'subject': 'hi', 'body': 'two'},
+        {'to': 'c@example.com', 'subject': 'hi', 'body': 'one'},
+        {'to': 'd@example.com', 'subject': 'hi', 'body': 'one'},
+    ]
+
+    messages = whispir.messages.send_many(payloads, max_recipients=2)
+
+    assert sorted(message['to'] for message in sent) == [
+        'a@example.com;c@example.com', 'b@example.com', 'd@example.com']
+    assert all(isinstance(message, Message) for message in messages)
+    assert messages[0]['id'] == messages[2]['id']
+    assert len({message['id'] for message in messages}) == 3
+
+
+def test_batcher_flushes_after_delay(whispir, sent):
+    with whispir.messages.batcher(max_delay=0.01) as batcher:
+        first = batcher.submit(to='a@example.com', body='hello')
+        second = batcher.submit(to='b@example.com', body='hello')
+        message = first.result(timeout=5)
+        assert second.result(timeout=5) is message
+
+    assert sent == [{'to': 'a@example.com;b@example.com', 'body': 'hello'}]
+
+
+def test_batcher_failed_send(whispir):
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'), status=400, body='')
+
+    with whispir.messages.batcher(max_delay=None) as batcher:
+        future = batcher.submit(to='a@example.com', body='hello')
+
+    with pytest.raises(whispyr.ClientError):
+        future.result()
+
+
+def test_enqueue_sends_in_background(whispir, sent):
+    whispir.send_queue(workers=1, max_delay=0.05)
+    futures = [whispir.enqueue(to='{}@example.com'.format(n), body='hello')
+               for n in range(3)]
+    whispir.flush()
+
+    assert all(future.done() for future in futures)
+    assert len({future.result()['id'] for future in futures}) == len(sent)
+    recipients = ';'.join(message['to'] for message in sent).split(';')
+    assert sorted(recipients) == [
+        '0@example.com', '1@example.com', '2@example.com']
+    whispir.close()
+
+
+def test_send_queue_retries_server_errors(whispir):
+    location = 'https://api.whispir.com/messages/M1'
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'),
+        responses=[
+            httpretty.Response(body='', status=500),
+            httpretty.Response(body='accepted', status=202,
+                               adding_headers={'Location': location}),
+        ])
+
+    queue = whispir.send_queue(workers=1, retries=1, backoff=0)
+    future = queue.enqueue(to='a@example.com', body='hello')
+    queue.close()
+
+    assert future.result()['id'] == 'M1'
+
+
+def test_send_queue_caps_recipients(whispir, sent):
+    queue = whispir.send_queue(workers=1, max_recipients=3, max_delay=0.05)
+    futures = [queue.enqueue(to='{0}a@example.com;{0}b@example.com'.format(n),
+                             body='hello')
+               for n in range(4)]
+    queue.close()
+
+    assert all(future.result() for future in futures)
+    assert len(sent) == 4
+    assert all(len(message['to'].split(';')) <= 3 for message in sent)
+
+
+def test_send_queue_requires_recipients(whispir):
+    queue = whispir.send_queue(workers=1)
+    with pytest.raises(ValueError):
+        queue.enqueue(body='hello')
+    with pytest.raises(ValueError):
+        queue.enqueue(to=['a@example.com'], body='hello')
+    queue.close()
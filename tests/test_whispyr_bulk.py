@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` bulk operations"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import ClientError, F
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+CONTACTS = [
+    {'id': 'C{}'.format(n), 'status': 'A' if n % 3 else 'D'}
+    for n in range(10)
+]
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              page_size=4)
+
+
+@pytest.fixture
+def contacts():
+    contacts = {contact['id']: dict(contact) for contact in CONTACTS}
+
+    def list_contacts(request, uri, headers):
+        offset = int(re.search(r'offset=(\d+)', uri).group(1))
+        items = sorted(contacts.values(), key=lambda c: int(c['id'][1:]))
+        body = {'contacts': items[offset:offset + 4]}
+        if offset + 4 < len(items):
+            body['link'] = [{
+                'rel': 'next',
+                'uri': 'https://api.whispir.com/contacts?limit=4&offset={}'
+                       .format(offset + 4)
+            }]
+        return 200, headers, json.dumps(body)
+
+    def change_contact(request, uri, headers):
+        contact_id = uri.rsplit('/', 1)[1]
+        if contact_id not in contacts:
+            return 404, headers, ''
+        if request.method == 'DELETE':
+            del contacts[contact_id]
+        else:
+            contacts[contact_id].update(json.loads(request.body))
+        return 204, headers, ''
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts(\?.*)?$'), body=list_contacts)
+    for method in [httpretty.DELETE, httpretty.PUT]:
+        httpretty.register_uri(
+            method, re.compile(r'.*/contacts/\w+'), body=change_contact)
+    return contacts
+
+
+def test_delete_many_partial_failure(whispir, contacts):
+    results = whispir.contacts.delete_many(['C1', 'C404', 'C2'],
+                                           max_workers=2)
+    assert list(results) == ['C1', 'C404', 'C2']
+    assert results['C1'] is None and results['C2'] is None
+    assert isinstance(results['C404'], ClientError)
+    assert 'C1' not in contacts and 'C2' not in contacts
+
+
+def test_delete_many_from_filtered_listing(whispir, contacts):
+    results = whispir.contacts.delete_many(
+        whispir.contacts.list(), where=lambda c: c['status'] == 'D')
+    assert list(results) == ['C0', 'C3', 'C6', 'C9']
+    assert not any(results.values())
+    assert sorted(c['status'] for c in contacts.values()) == ['A'] * 6
+
+
+def test_delete_many_where_expression(whispir, contacts):
+    results = whispir.contacts.delete_many(
+        whispir.contacts.list(), where=F('status') == 'D')
+    assert list(results) == ['C0', 'C3', 'C6', 'C9']
+    assert sorted(c['status'] for c in contacts.values()) == ['A'] * 6
+
+
+def test_update_many(whispir, contacts):
+    contact = whispir.contacts.Contact(id='C4')
+    results = whispir.contacts.update_many(
+        [('C1', {'status': 'D'}), (contact, {'status': 'D'})], rate=100)
+    assert list(results) == ['C1', 'C4']
+    assert contacts['C1']['status'] == contacts['C4']['status'] == 'D'
+
+    results = whispir.contacts.update_many({'C2': {'status': 'D'}})
+    assert results == {'C2': None}
+    assert contacts['C2']['status'] == 'D'
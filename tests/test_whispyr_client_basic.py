@@ -3,15 +3,22 @@
 """Tests for `whispyr` package"""
 
 import base64
+import gzip
+import io
+import json
 
 import httpretty
 from httpretty import HTTPretty
 
 import pytest
 import re
+import time
+
+from requests import Response
 
 import whispyr
-from whispyr import ClientError, WhispirRetry
+from whispyr import ClientError, ServerError, WhispirRetry, \
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, Transport, Hedging
 
 httpretty.HTTPretty.allow_net_connect = False
 
@@ -153,6 +160,236 @@ def test_no_retry_for_forbidden(whispir):
     assert exc.response.status_code == 403
 
 
+def test_collection_headers_are_set(whispir):
+    httpretty.register_uri(httpretty.GET, re.compile(r'.*', re.M), body='{}')
+    whispir.contacts.request('get', 'contacts', headers={'X-Extra': '1'})
+    whispir.contacts.request('get', 'contacts')
+
+    request = httpretty.last_request()
+    vnd_type = 'application/vnd.whispir.contact-v1+json'
+    assert request.headers['Accept'] == vnd_type
+    assert request.headers['Content-Type'] == vnd_type
+    assert 'X-Extra' not in request.headers
+    assert whispir.contacts._headers == {
+        'Accept': vnd_type, 'Content-Type': vnd_type}
+
+
+@pytest.mark.parametrize('base_url, path, expected', [
+    ('https://api.us.whispir.com', 'workspaces',
+     'https://api.us.whispir.com/workspaces'),
+    ('https://example.com/api/', 'workspaces/W1/contacts',
+     'https://example.com/api/workspaces/W1/contacts'),
+    ('https://example.com/api', 'workspaces',
+     'https://example.com/workspaces'),
+    ('https://example.com/api/', '/workspaces',
+     'https://example.com/workspaces'),
+])
+def test_url(base_url, path, expected):
+    whispir = whispyr.Whispir(
+        TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY, base_url=base_url)
+    assert whispir.url(path) == expected
+
+
+def test_accept_encoding_is_set(whispir):
+    httpretty.register_uri(httpretty.GET, re.compile(r'.*', re.M), body='{}')
+    whispir.request('get', 'workspaces')
+
+    request = httpretty.last_request()
+    assert 'gzip' in request.headers['Accept-Encoding']
+    assert 'deflate' in request.headers['Accept-Encoding']
+
+
+def test_compressed_response_stats(whispir):
+    body = json.dumps({'contacts': [{'firstName': 'John'}] * 100})
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*', re.M), body=_gzip(body),
+        adding_headers={'Content-Encoding': 'gzip'})
+
+    assert whispir.request('get', 'contacts') == json.loads(body)
+    assert whispir.stats.received_bytes == len(body)
+    assert whispir.stats.response_ratio > 10
+
+
+@pytest.mark.parametrize('compress, min_size, compressed', [
+    (True, 0, True),
+    (True, 10 ** 6, False),
+    (False, 0, False),
+])
+def test_request_compression(compress, min_size, compressed):
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              compress=compress, compress_min_size=min_size)
+    payload = {'firstName': 'John', 'lastName': 'Wick' * 100}
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.POST, re.compile(r'.*', re.M), body='{}')
+        whispir.contacts.request('post', 'contacts', json=payload)
+        request = httpretty.last_request()
+
+    vnd_type = 'application/vnd.whispir.contact-v1+json'
+    assert request.headers['Content-Type'] == vnd_type
+    body = request.body
+    if compressed:
+        assert request.headers['Content-Encoding'] == 'gzip'
+        body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+        assert whispir.stats.request_ratio > 1
+    else:
+        assert 'Content-Encoding' not in request.headers
+        assert whispir.stats.request_ratio == 1
+    assert json.loads(body.decode('utf-8')) == payload
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(window_size=4, min_calls=2, reset_timeout=60)
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              circuit_breaker=breaker)
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*/contacts.*'), status=503, body='')
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*/workspaces$'), body='{}')
+
+        for _ in range(2):
+            with pytest.raises(ServerError):
+                whispir.request('get', 'workspaces/W1/contacts')
+
+        with pytest.raises(CircuitOpenError) as excinfo:
+            whispir.request('get', 'workspaces/W1/contacts/C1')
+        assert excinfo.value.endpoint == 'contacts'
+        assert excinfo.value.retry_after > 0
+
+        # other endpoints are not affected
+        assert whispir.request('get', 'workspaces') == {}
+
+        # half-open probe closes the circuit
+        breaker.reset_timeout = 0
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*/contacts.*'), body='{}')
+        assert whispir.request('get', 'contacts') == {}
+        assert breaker.circuit('contacts').state == 'closed'
+
+
+def test_circuit_probe_raising_is_recorded():
+    breaker = CircuitBreaker(min_calls=1, reset_timeout=0)
+    circuit = breaker.circuit('contacts')
+    circuit.record(False)
+    assert circuit.state == 'open'
+
+    def probe():
+        raise LookupError('not a requests error')
+
+    with pytest.raises(LookupError):
+        circuit.call(probe)
+    assert circuit.state == 'open'
+
+    response = Response()
+    response.status_code = 200
+    assert circuit.call(lambda: response) is response
+    assert circuit.state == 'closed'
+
+
+class RecordingTransport(Transport):
+
+    def __init__(self, *args):
+        super(RecordingTransport, self).__init__(*args)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(kwargs)
+        response = Response()
+        response.status_code = 200
+        response._content = b'{}'
+        return response
+
+
+def test_timeouts():
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              transport=RecordingTransport, timeout=(3, 30))
+    whispir.request('get', 'workspaces')
+    whispir.request('get', 'workspaces', timeout=5)
+    with whispyr.deadline(10):
+        whispir.request('get', 'workspaces')
+
+    timeouts = [call['timeout'] for call in whispir._transport.calls]
+    assert timeouts[:2] == [(3, 30), 5]
+    connect, read = timeouts[2]
+    assert connect == 3
+    assert 9 < read <= 10
+
+
+def test_deadline_exceeded():
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              transport=RecordingTransport)
+    with whispir.deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            list(whispir.contacts.list())
+    assert whispir._transport.calls == []
+
+
+def test_deadline_stops_retries(whispir):
+    qps_headers = {
+        'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPS',
+        'Retry-After': 5
+    }
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*', re.M),
+        responses=[
+            HTTPretty.Response(
+                body='', status=403, adding_headers=qps_headers),
+            HTTPretty.Response(body='{}', status=200),
+        ]
+    )
+
+    started = time.time()
+    with whispyr.deadline(1):
+        with pytest.raises(ClientError):
+            whispir.request('get', 'workspaces')
+    assert time.time() - started < 1
+
+
+def test_hedging_uses_fastest_response():
+    hedging = Hedging(initial_delay=0.05, max_ratio=1)
+    delays = iter([1, 0])
+
+    def read():
+        delay = next(delays)
+        time.sleep(delay)
+        return delay
+
+    started = time.time()
+    assert hedging.call(read) == 0
+    assert time.time() - started < 0.5
+
+
+def test_hedging_load_is_capped():
+    hedging = Hedging(initial_delay=0, max_ratio=0)
+    calls = []
+
+    def read():
+        calls.append(1)
+        time.sleep(0.01)
+        return 'done'
+
+    assert hedging.call(read) == 'done'
+    assert len(calls) == 1
+
+
+def test_show_is_hedged():
+    hedging = Hedging()
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              transport=RecordingTransport, hedging=hedging)
+    whispir.contacts.show('C1')
+    assert hedging._reads == 1
+    assert len(whispir._transport.calls) == 1
+
+
+def _gzip(string):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(string.encode('utf-8'))
+    return buf.getvalue()
+
+
 def _basic_auth(username, password):
     username = username.encode('latin1')
     password = password.encode('latin1')
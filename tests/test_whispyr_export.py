@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` columnar export"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr.export import write_parquet
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+STATUSES = [
+    {'name': 'John', 'status': 'SENT', 'attempts': 1},
+    {'name': 'Jane', 'status': 'PENDING', 'attempts': 2},
+    {'name': 'Jack', 'status': 'SENT', 'attempts': 3},
+]
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              page_size=2)
+
+
+@pytest.fixture
+def statuses(whispir):
+    body = json.dumps({'messageStatuses': STATUSES})
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/messagestatus.*'), body=body)
+    message = whispir.messages.Message(id='M1')
+    return message.statuses.list(view='detailed')
+
+
+def test_python_batches(statuses):
+    batches = list(statuses.to_batches(backend='python'))
+    assert batches == [
+        {'name': ['John', 'Jane'], 'status': ['SENT', 'PENDING'],
+         'attempts': [1, 2]},
+        {'name': ['Jack'], 'status': ['SENT'], 'attempts': [3]},
+    ]
+
+
+def test_numpy_batches(statuses):
+    numpy = pytest.importorskip('numpy')
+    batch, _ = statuses.to_batches(columns=['attempts', 'status'],
+                                   backend='numpy')
+    assert sorted(batch) == ['attempts', 'status']
+    assert batch['attempts'].dtype.kind == 'i'
+    assert numpy.array_equal(batch['attempts'], [1, 2])
+
+
+def test_arrow_batches(statuses):
+    pytest.importorskip('pyarrow')
+    batches = list(statuses.to_batches(backend='arrow'))
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert batches[0].schema.names == ['name', 'status', 'attempts']
+    assert batches[1].column(0).to_pylist() == ['Jack']
+
+
+def test_write_parquet(statuses, tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmpdir.join('statuses.parquet'))
+    assert write_parquet(statuses, path) == 3
+    assert parquet.read_table(path).to_pylist() == STATUSES
+
+
+def test_write_parquet_optional_fields(whispir, tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    contacts = [
+        {'firstName': 'John', 'workEmail': None},
+        {'firstName': 'Jane', 'workEmail': None},
+        {'firstName': 'Jack', 'workEmail': 'jack@example.com'},
+    ]
+    for n, contact in enumerate(contacts):
+        contact['link'] = [{
+            'rel': 'self',
+            'uri': 'https://api.whispir.com/contacts/C{}'.format(n)}]
+
+    def list_contacts(request, uri, headers):
+        offset = int(re.search(r'offset=(\d+)', uri).group(1))
+        body = {'contacts': contacts[offset:offset + 2]}
+        if offset + 2 < len(contacts):
+            body['link'] = [{
+                'rel': 'next',
+                'uri': 'https://api.whispir.com/contacts?limit=2&offset={}'
+                       .format(offset + 2)}]
+        return 200, headers, json.dumps(body)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts(\?.*)?$'),
+        body=list_contacts)
+    path = str(tmpdir.join('contacts.parquet'))
+
+    assert write_parquet(whispir.contacts.list(), path,
+                         columns=['id', 'firstName', 'workEmail']) == 3
+    table = parquet.read_table(path)
+    assert table.column('id').to_pylist() == ['C0', 'C1', 'C2']
+    assert table.column('workEmail').to_pylist() == [
+        None, None, 'jack@example.com']
+
+    batch = next(whispir.contacts.list().to_batches(backend='python'))
+    assert batch['id'] == ['C0', 'C1']
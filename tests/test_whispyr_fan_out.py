@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` cross-workspace fan-out"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import Contact
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+BASE_URL = 'https://api.us.whispir.com'
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY)
+
+
+def _register_contacts(workspace_id, contact_ids):
+    body = json.dumps({'contacts': [
+        {'id': contact_id, 'firstName': 'John'} for contact_id in contact_ids
+    ]})
+    url = '{}/workspaces/{}/contacts'.format(BASE_URL, workspace_id)
+    httpretty.register_uri(httpretty.GET, url, body=body)
+
+
+def test_fan_out_all_workspaces(whispir):
+    workspaces = json.dumps({'workspaces': [{'id': 'WS1'}, {'id': 'WS2'}]})
+    httpretty.register_uri(
+        httpretty.GET, re.compile(BASE_URL + r'/workspaces(\?.*)?$'),
+        body=workspaces)
+    _register_contacts('WS1', ['C1', 'C2'])
+    _register_contacts('WS2', ['C3'])
+
+    results = list(whispir.workspaces.fan_out('contacts', max_workers=2))
+
+    assert sorted((ws, c['id']) for ws, c in results) == [
+        ('WS1', 'C1'), ('WS1', 'C2'), ('WS2', 'C3')]
+    for _, contact in results:
+        assert isinstance(contact, Contact)
+
+
+def test_fan_out_selected_workspaces(whispir):
+    _register_contacts('WS1', ['C1'])
+    _register_contacts('WS2', ['C2'])
+
+    workspace = whispir.workspaces.Workspace(id='WS2')
+    results = list(whispir.workspaces.fan_out(
+        'contacts', workspaces=[workspace]))
+
+    assert [(ws, c['id']) for ws, c in results] == [('WS2', 'C2')]
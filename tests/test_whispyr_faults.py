@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` fault injection and retry benchmark"""
+
+import functools
+
+import pytest
+
+from requests.exceptions import ConnectionError
+
+import whispyr
+from whispyr import ClientError, FaultInjectingTransport, WhispirRetry
+from whispyr.bench import run, _SimulatedTransport
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+def _whispir(retry=None, **faults):
+    transport = functools.partial(
+        FaultInjectingTransport, transport=_SimulatedTransport, latency=0,
+        retry_after=0, seed=7, **faults)
+    return whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                           transport=transport,
+                           retry=retry or WhispirRetry(total=3))
+
+
+def test_throttling_is_retried():
+    whispir = _whispir(WhispirRetry(total=10), throttle_rate=0.2,
+                       unavailable_rate=0.1, qps_rate=0.1)
+    for _ in range(20):
+        assert whispir.request('get', 'workspaces') == {}
+    injected = whispir._transport.injected
+    assert injected['throttle'] and injected['unavailable'] and \
+        injected['qps']
+
+
+def test_daily_quota_is_not_retried():
+    whispir = _whispir(qpd_rate=1)
+    with pytest.raises(ClientError) as excinfo:
+        whispir.request('get', 'workspaces')
+    assert excinfo.value.response.status_code == 403
+    assert whispir._transport.injected['qpd'] == 1
+
+
+def test_connection_resets():
+    whispir = _whispir(reset_rate=1)
+    with pytest.raises(ConnectionError):
+        whispir.request('get', 'workspaces')
+    assert whispir._transport.injected['reset'] == 4
+
+
+def test_latency_spikes():
+    sleeps = []
+    whispir = _whispir(spike_rate=1, spike_latency=3, sleep=sleeps.append)
+    whispir.request('get', 'workspaces')
+    assert sleeps == [3]
+
+
+def test_benchmark_report():
+    policies = {'none': WhispirRetry(total=0), 'retry': WhispirRetry(total=5)}
+    reports = run(policies, requests=50, workers=1, latency=0, seed=1,
+                  throttle_rate=0.3, retry_after=0)
+    none, retry = reports
+    assert none['policy'] == 'none'
+    assert none['retries'] == 0
+    assert none['succeeded'] < retry['succeeded'] == 50
+    assert retry['retries'] > 0
+    assert retry['wasted_retries'] == 0
+    assert retry['p50'] <= retry['p99']
+    assert retry['goodput'] > 0
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` durable outbox"""
+
+import itertools
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import CircuitBreaker, WhispirRetry
+from whispyr.outbox import Outbox
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY)
+
+
+@pytest.fixture
+def outbox_path(tmpdir):
+    return str(tmpdir.join('outbox.sqlite'))
+
+
+@pytest.fixture
+def sent():
+    sent = []
+    ids = itertools.count()
+
+    def create_message(request, uri, headers):
+        payload = json.loads(request.body.decode('utf-8'))
+        if payload['to'] == 'invalid':
+            return 422, headers, ''
+        sent.append((uri, payload))
+        location = 'https://api.whispir.com/messages/M{}'.format(next(ids))
+        headers['Location'] = location
+        return 202, headers, 'Your request has been accepted for processing'
+
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'), body=create_message)
+    return sent
+
+
+def test_outbox_survives_reopen(outbox_path):
+    outbox = Outbox(outbox_path)
+    ids = outbox.add_many([{'to': 'a@example.com', 'body': 'one'},
+                           {'to': 'b@example.com', 'body': 'two'}])
+    outbox.close()
+
+    outbox = Outbox(outbox_path)
+    assert outbox.counts() == {'pending': 2}
+    assert [item['id'] for item in outbox.pending()] == ids
+    assert outbox.add_many([]) == []
+    outbox.close()
+
+
+def test_outbox_drain(whispir, outbox_path, sent):
+    outbox = Outbox(outbox_path)
+    generic = outbox.add(to='a@example.com', body='hello')
+    in_workspace = outbox.add(to='b@example.com', body='hi', workspace='W1')
+    invalid = outbox.add(to='invalid', body='hello')
+
+    assert outbox.drain(whispir) == 2
+    assert outbox.drain(whispir) == 0
+
+    assert [uri for uri, _ in sent] == [
+        'https://api.us.whispir.com/messages',
+        'https://api.us.whispir.com/workspaces/W1/messages']
+    assert outbox.get(generic)['state'] == 'sent'
+    assert outbox.get(generic)['message_id'] == 'M0'
+    assert outbox.get(in_workspace)['message_id'] == 'M1'
+    assert outbox.get(invalid)['state'] == 'failed'
+    assert outbox.counts() == {'sent': 2, 'failed': 1}
+    outbox.close()
+
+
+def test_outbox_backs_off_failed_attempts(outbox_path):
+    now = [1000.0]
+    outbox = Outbox(outbox_path, backoff=10, max_attempts=3,
+                    clock=lambda: now[0])
+    item = outbox.add(to='a@example.com', body='hello')
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'), status=503)
+
+    with httpretty.enabled():
+        whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                                  retry=WhispirRetry(total=0))
+        assert outbox.drain(whispir) == 0
+        assert outbox.get(item)['attempts'] == 1
+        # not due before the backoff passed
+        now[0] += 9
+        assert outbox.drain(whispir) == 0
+        assert outbox.get(item)['attempts'] == 1
+        now[0] += 1
+        outbox.drain(whispir)
+        assert outbox.get(item)['attempts'] == 2
+        now[0] += 10
+        outbox.drain(whispir)
+        assert outbox.get(item)['attempts'] == 2
+        now[0] += 10
+        outbox.drain(whispir)
+
+    assert outbox.get(item)['attempts'] == 3
+    assert outbox.get(item)['state'] == 'failed'
+    outbox.close()
+
+
+def test_outbox_open_circuit_is_not_an_attempt(outbox_path, sent):
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.circuit('messages').record(False)
+    outbox = Outbox(outbox_path, max_attempts=1)
+    item = outbox.add(to='a@example.com', body='hello')
+
+    with httpretty.enabled():
+        whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                                  circuit_breaker=breaker)
+        assert outbox.drain(whispir) == 0
+
+    assert outbox.get(item)['state'] == 'pending'
+    assert outbox.get(item)['attempts'] == 0
+    assert 'CircuitOpenError' in outbox.get(item)['error']
+    assert not sent
+    outbox.close()
+
+
+def test_outbox_keeps_throttled_messages(whispir, outbox_path):
+    now = [1000.0]
+    outbox = Outbox(outbox_path, clock=lambda: now[0])
+    over_quota = outbox.add(to='a@example.com', body='hello')
+    throttled = outbox.add(to='b@example.com', body='hello')
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/messages$'),
+        responses=[
+            httpretty.Response(body='', status=403, adding_headers={
+                'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPD'}),
+            httpretty.Response(body='', status=429),
+        ])
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              retry=WhispirRetry(total=0))
+
+    assert outbox.drain(whispir) == 0
+
+    assert outbox.counts() == {'pending': 2}
+    assert outbox.get(over_quota)['attempts'] == 0
+    assert outbox.get(throttled)['attempts'] == 1
+    # the throttled message is due again after the backoff, the other one
+    # only once the daily quota resets
+    now[0] += 1
+    assert [item['id'] for item in outbox.pending(due=now[0])] == [throttled]
+    assert len(outbox.pending(due=24 * 60 * 60)) == 2
+    outbox.close()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` client pool"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import WhispirPool, ClientError, QuotaExceeded, QuotaTracker, \
+    CircuitBreaker, CircuitOpenError
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+
+QPD_HEADERS = {'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPD'}
+
+
+def credential(name):
+    return {
+        'name': name,
+        'username': TEST_USERNAME,
+        'password': TEST_PASSWORD,
+        'api_key': 'K3Y-{}'.format(name),
+        'base_url': 'https://{}.whispir.test/'.format(name),
+    }
+
+
+class Hosts(list):
+    over_quota = None
+
+
+@pytest.fixture
+def hosts():
+    hosts = Hosts()
+    hosts.over_quota = set()
+
+    def respond(request, uri, headers):
+        host = request.headers['Host'].split('.')[0]
+        hosts.append(host)
+        if host in hosts.over_quota:
+            headers.update(QPD_HEADERS)
+            return 403, headers, ''
+        return 200, headers, json.dumps({'host': host})
+
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*', re.M), body=respond)
+        yield hosts
+
+
+@pytest.fixture
+def pool():
+    return WhispirPool([credential('a'), credential('b')])
+
+
+def test_requests_spread_over_members(pool, hosts):
+    for _ in range(4):
+        pool.request('get', 'messages')
+    assert sorted(hosts) == ['a', 'a', 'b', 'b']
+
+
+def test_failover_on_daily_quota(pool, hosts):
+    hosts.over_quota.add('a')
+    for _ in range(3):
+        assert pool.request('get', 'messages') == {'host': 'b'}
+    # the exhausted member isn't asked again until the quota resets
+    assert hosts.count('a') == 1
+
+    hosts.over_quota.add('b')
+    with pytest.raises(ClientError) as excinfo:
+        pool.request('get', 'messages')
+    assert excinfo.value.response.status_code == 403
+    # nobody left to ask
+    with pytest.raises(QuotaExceeded):
+        pool.request('get', 'messages')
+
+
+def test_failover_on_local_quota(hosts):
+    quota = QuotaTracker(1)
+    pool = WhispirPool([credential('a'), credential('b')], quota=quota)
+    responses = [pool.request('get', 'messages') for _ in range(2)]
+    assert sorted(r['host'] for r in responses) == ['a', 'b']
+    with pytest.raises(QuotaExceeded):
+        pool.request('get', 'messages')
+
+
+def test_class_share_does_not_block_member(hosts):
+    quota = QuotaTracker(10, sleep=lambda seconds: None)
+    pool = WhispirPool([credential('a')], quota=quota)
+    with whispyr.priority('bulk'):
+        for _ in range(7):
+            pool.request('get', 'messages')
+        with pytest.raises(QuotaExceeded):
+            pool.request('get', 'messages')
+
+    with whispyr.priority('critical'):
+        for _ in range(3):
+            assert pool.request('get', 'messages') == {'host': 'a'}
+        with pytest.raises(QuotaExceeded):
+            pool.request('get', 'messages')
+    assert pool.members[0].exhausted_until > 0
+
+
+def test_open_circuit_does_not_fail_over(hosts):
+    breaker = CircuitBreaker(min_calls=1)
+    pool = WhispirPool([credential('a'), credential('b')],
+                       circuit_breaker=breaker)
+    breaker.circuit('messages').record(False)
+    with pytest.raises(CircuitOpenError):
+        pool.request('get', 'messages')
+    assert not hosts
+    assert all(m.in_flight == 0 for m in pool.members)
+
+
+def test_workspace_affinity(hosts):
+    pool = WhispirPool([credential('a'), credential('b')],
+                       affinity={'W1': 'b'})
+    for _ in range(3):
+        assert pool.request('get', 'workspaces/W1/messages')['host'] == 'b'
+
+    sticky = pool.request('get', 'workspaces/W2/messages')['host']
+    for _ in range(3):
+        assert pool.request('get', 'workspaces/W2/messages')['host'] == sticky
+
+    hosts.over_quota.add('b')
+    with pytest.raises(ClientError):
+        pool.request('get', 'workspaces/W1/messages')
+
+
+def test_collections(pool, hosts):
+    workspace = pool.workspaces.Workspace(id='W1')
+    message = workspace.messages.show('M1')
+    assert message == {'host': hosts[0]}
+    assert message.collection.whispir is pool
+
+
+def test_pool_client_attributes(hosts):
+    quota = QuotaTracker(1000)
+    pool = WhispirPool([credential('a'), credential('b')], quota=quota,
+                       timeout=5)
+    assert pool.quota is quota
+    assert pool.timeout == 5
+    assert pool.circuit_breaker is None and pool.scheduler is None
+    assert pool.compress_min_size == pool.members[0].client.compress_min_size
+    assert not isinstance(pool, whispyr.Whispir)
+
+    pool.request('get', 'workspaces')
+    pool.request('get', 'workspaces')
+    assert pool.stats.received_bytes == sum(
+        m.client.stats.received_bytes for m in pool.members) > 0
+    assert pool.stats.request_ratio is None
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` list filters"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+from six.moves.urllib.parse import urlparse, parse_qs
+
+import whispyr
+from whispyr import F
+from whispyr.query import plan, Param
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+NAMES = ['John', 'Jane', 'Jack', 'Jill']
+CONTACTS = [
+    {'id': 'C{}'.format(n), 'firstName': NAMES[n % 4],
+     'status': 'A' if n % 3 else 'D', 'address': {'city': 'Sydney'}}
+    for n in range(12)
+]
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              page_size=5)
+
+
+@pytest.fixture
+def queries():
+    queries = []
+
+    def list_contacts(request, uri, headers):
+        query = parse_qs(urlparse(uri).query)
+        queries.append(query)
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        # whispir search is looser than the filter: it ignores status
+        contacts = [c for c in CONTACTS
+                    if 'firstName' not in query or
+                    c['firstName'].startswith(query['firstName'][0])]
+        body = {'contacts': contacts[offset:offset + limit]}
+        if offset + limit < len(contacts):
+            body['link'] = [{
+                'rel': 'next',
+                'uri': 'https://api.whispir.com/contacts?limit={}&offset={}'
+                       .format(limit, offset + limit)
+            }]
+        return 200, headers, json.dumps(body)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts(\?.*)?$'), body=list_contacts)
+    return queries
+
+
+def test_pushdown_and_client_side_filter(whispir, queries):
+    where = (F('firstName') == 'Jack') & (F('status') == 'A')
+    contacts = list(whispir.contacts.list(where=where))
+    assert [c['id'] for c in contacts] == ['C2', 'C10']
+    assert queries[0]['firstName'] == ['Jack']
+    assert queries[0]['status'] == ['A']
+    assert len(queries) == 1
+
+
+def test_client_side_expressions(whispir, queries):
+    where = ((F('firstName').isin(['John', 'Jill']) | F('id').startswith('C1'))
+             & ~(F('status') == 'D') & (F('address.city') == 'Sydney'))
+    contacts = whispir.contacts.list(where=where, fields=['id'])
+    assert [c['id'] for c in contacts] == ['C1', 'C4', 'C7', 'C8', 'C10',
+                                           'C11']
+    assert 'firstName' not in queries[0]
+
+
+def test_window_and_count_of_filtered_list(whispir, queries):
+    where = F('status') == 'D'
+    assert [c['id'] for c in whispir.contacts.list(where=where)[1:3]] == [
+        'C3', 'C6']
+    assert whispir.contacts.list(where=where).count() == 4
+
+
+def test_message_date_range_pushdown(whispir):
+    later, earlier = 1534263029000, 1534263028000
+    items = [{'id': 'M2', 'createdTime': later},
+             {'id': 'M1', 'createdTime': earlier}]
+
+    def list_messages(request, uri, headers):
+        offset = int(re.search(r'offset=(\d+)', uri).group(1))
+        body = {'messages': items if offset == 0 else []}
+        return 200, headers, json.dumps(body)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/messages.*'), body=list_messages)
+
+    messages = whispir.messages.list(where=F('createdTime') > earlier)
+    assert [m['id'] for m in messages] == ['M2']
+    query = parse_qs(urlparse(httpretty.last_request().path).query)
+    assert query['offset'] == ['5']
+    assert query['criteriaFromDate'] == ['13/08/2018 16:10']
+
+
+def test_plan_exact_params():
+    params = {('status', 'eq'): Param('status', exact=True)}
+    query, residual = plan((F('status') == 'A') & (F('x') > 1), params)
+    assert query == {'status': 'A'}
+    assert residual.matches({'x': 2}) and not residual.matches({'x': 1})
+    assert plan(F('status') == 'A', params) == ({'status': 'A'}, None)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` quota accounting"""
+
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import ClientError, QuotaExceeded, QuotaTracker, \
+    CircuitBreaker, CircuitOpenError, WhispirRetry
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+NOON = 1534161600  # 2018-08-13 12:00 UTC
+
+
+class Clock(object):
+
+    def __init__(self, now=NOON):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+def test_priority_shares():
+    clock = Clock()
+    quota = QuotaTracker(10, clock=clock, sleep=clock.sleep)
+
+    for _ in range(7):
+        quota.acquire(TEST_API_KEY, 'bulk')
+    with pytest.raises(QuotaExceeded) as excinfo:
+        quota.acquire(TEST_API_KEY, 'bulk')
+    assert excinfo.value.priority == 'bulk'
+
+    for _ in range(2):
+        quota.acquire(TEST_API_KEY, 'normal')
+    with pytest.raises(QuotaExceeded):
+        quota.acquire(TEST_API_KEY, 'normal')
+
+    quota.acquire(TEST_API_KEY, 'critical')
+    assert quota.usage(TEST_API_KEY) == 10
+
+
+def test_pacing_when_forecast_exceeds_share():
+    clock = Clock()
+    quota = QuotaTracker(1000, clock=clock, sleep=clock.sleep)
+
+    for _ in range(400):
+        quota.acquire(TEST_API_KEY, 'critical')
+    assert clock.sleeps == []
+    assert quota.forecast(TEST_API_KEY) == 800
+
+    for _ in range(3):
+        quota.acquire(TEST_API_KEY, 'bulk')
+    # the rest of bulk share (~300) is spread over the rest of the day
+    interval = 12 * 60 * 60 / 300.0
+    assert clock.sleeps == pytest.approx([interval, 2 * interval], rel=0.01)
+
+
+def test_counters_are_persisted(tmpdir):
+    path = str(tmpdir.join('quota.json'))
+    clock = Clock()
+    quota = QuotaTracker(100, path=path, save_interval=1, clock=clock)
+    for _ in range(3):
+        quota.acquire(TEST_API_KEY)
+
+    quota = QuotaTracker(100, path=path, clock=clock)
+    assert quota.usage(TEST_API_KEY) == 3
+
+    clock.now += 24 * 60 * 60
+    assert quota.usage(TEST_API_KEY) == 0
+    assert TEST_API_KEY not in tmpdir.join('quota.json').read()
+
+
+def test_daily_quota_exhausted_by_whispir():
+    quota = QuotaTracker(100)
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              quota=quota)
+    qpd_headers = {'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPD'}
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*', re.M), status=403, body='',
+            adding_headers=qpd_headers)
+        with pytest.raises(ClientError):
+            whispir.request('get', 'workspaces')
+
+        with whispyr.priority('critical'):
+            with pytest.raises(QuotaExceeded):
+                whispir.request('get', 'workspaces')
+
+
+def test_only_sent_requests_count():
+    quota = QuotaTracker(100)
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              quota=quota, retry=WhispirRetry(total=0),
+                              circuit_breaker=CircuitBreaker(min_calls=1))
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*', re.M), status=500, body='')
+        with pytest.raises(whispyr.ServerError):
+            whispir.request('get', 'workspaces')
+        for _ in range(5):
+            with pytest.raises(CircuitOpenError):
+                whispir.request('get', 'workspaces')
+    assert quota.usage(TEST_API_KEY) == 1
+
+
+def test_retries_count():
+    quota = QuotaTracker(100)
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              quota=quota)
+    qps_headers = {'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPS',
+                   'Retry-After': '0'}
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*', re.M),
+            responses=[
+                httpretty.Response(body='', status=403,
+                                   adding_headers=qps_headers),
+                httpretty.Response(body='', status=403,
+                                   adding_headers=qps_headers),
+                httpretty.Response(body='{}', status=200),
+            ])
+        assert whispir.request('get', 'workspaces') == {}
+    assert quota.usage(TEST_API_KEY) == 3
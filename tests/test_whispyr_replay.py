@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` record/replay transports"""
+
+import functools
+import gzip
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import RecordingTransport, ReplayTransport, WhispirRetry, \
+    ServerError
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+def _whispir(transport, **kwargs):
+    return whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                           transport=transport, **kwargs)
+
+
+@pytest.fixture(params=['traffic.jsonl', 'traffic.jsonl.gz'])
+def recording(request, tmpdir):
+    path = str(tmpdir.join(request.param))
+    whispir = _whispir(functools.partial(RecordingTransport, path=path))
+
+    def show_message(request, uri, headers):
+        message_id = uri.rsplit('/', 1)[1]
+        return 200, headers, json.dumps({'id': message_id})
+
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*/workspaces/W1/messages/\w+'),
+            body=show_message)
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*/workspaces(\?.*)?$'),
+            body=json.dumps({'workspaces': [{'id': 'W1'}]}))
+        whispir.request('get', 'workspaces', params={'b': 2, 'a': 1})
+        whispir.request('get', 'workspaces/W1/messages/M1')
+        whispir.request('get', 'workspaces/W1/messages/M2')
+    whispir.close()
+    return path
+
+
+def test_replay(recording):
+    sleeps = []
+    transport = functools.partial(ReplayTransport, path=recording,
+                                  speed=10, sleep=sleeps.append)
+    whispir = _whispir(transport)
+
+    assert whispir.request('get', 'workspaces',
+                           params={'a': 1, 'b': 2}) == {
+        'workspaces': [{'id': 'W1'}]}
+    assert whispir.request('get', 'workspaces/W1/messages/M2') == {
+        'id': 'M2'}
+    # unknown ids are answered by responses of the same route in turn
+    assert whispir.request('get', 'workspaces/W2/messages/M3') == {
+        'id': 'M1'}
+    assert whispir.request('get', 'workspaces/W2/messages/M3') == {
+        'id': 'M2'}
+    assert len(sleeps) == 4
+    assert all(0 <= it < 1 for it in sleeps)
+
+    with pytest.raises(LookupError):
+        whispir.request('get', 'contacts')
+
+
+def test_recording_has_no_credentials(recording):
+    opener = gzip.open if recording.endswith('.gz') else open
+    with opener(recording, 'rb') as f:
+        content = f.read().decode('utf-8')
+    assert TEST_API_KEY not in content
+    assert TEST_PASSWORD not in content
+    records = [json.loads(line) for line in content.splitlines()]
+    assert [record['path'] for record in records] == [
+        '/workspaces?a=1&b=2',
+        '/workspaces/W1/messages/M1',
+        '/workspaces/W1/messages/M2']
+
+
+def test_replay_in_turn(tmpdir):
+    path = str(tmpdir.join('traffic.jsonl'))
+    with open(path, 'w') as f:
+        for name in ['A', 'B']:
+            f.write(json.dumps({
+                'method': 'GET', 'path': '/contacts', 'status': 200,
+                'headers': {}, 'body': json.dumps({'name': name}),
+                'elapsed': 0}) + '\n')
+    whispir = _whispir(functools.partial(ReplayTransport, path=path))
+
+    names = [whispir.request('get', 'contacts')['name'] for _ in range(3)]
+    assert names == ['A', 'B', 'A']
+
+
+def test_error_injection(recording):
+    transport = functools.partial(
+        ReplayTransport, path=recording, speed=None, error_rate=1,
+        retry_after=0)
+    whispir = _whispir(transport, retry=WhispirRetry(total=2))
+    with pytest.raises(ServerError) as excinfo:
+        whispir.request('get', 'workspaces/W1/messages/M1')
+    assert excinfo.value.response.status_code == 503
+
+    transport = functools.partial(
+        ReplayTransport, path=recording, speed=None, error_rate=0.2,
+        retry_after=0, seed=1)
+    whispir = _whispir(transport, retry=WhispirRetry(total=10))
+    for _ in range(20):
+        assert whispir.request('get', 'workspaces/W1/messages/M1')
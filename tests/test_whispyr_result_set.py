@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` lazy result sets"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+from six.moves.urllib.parse import urlparse, parse_qs
+
+import whispyr
+from whispyr import Contact
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+TOTAL = 45
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              page_size=10)
+
+
+@pytest.fixture
+def pages():
+    pages = []
+
+    def list_contacts(request, uri, headers):
+        query = parse_qs(urlparse(uri).query)
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        pages.append((offset, limit))
+        ids = range(offset, min(offset + limit, TOTAL))
+        body = {
+            'contacts': [{'id': 'C{}'.format(n)} for n in ids],
+            'status': '{} to {} of {}    '.format(
+                offset + 1, offset + len(ids), TOTAL),
+            'link': []
+        }
+        if offset + limit < TOTAL:
+            next_uri = 'https://api.whispir.com/contacts?limit={}&offset={}'
+            body['link'].append({
+                'rel': 'next',
+                'uri': next_uri.format(limit, offset + limit)
+            })
+        return 200, headers, json.dumps(body)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts.*'), body=list_contacts)
+    return pages
+
+
+def test_iterate(whispir, pages):
+    contacts = whispir.contacts.list()
+    assert next(contacts)['id'] == 'C0'
+    rest = list(contacts)
+    assert len(rest) == TOTAL - 1
+    assert all(isinstance(contact, Contact) for contact in rest)
+
+
+def test_slice_fetches_window_only(whispir, pages):
+    contacts = whispir.contacts.list()[22:35]
+    assert [c['id'] for c in contacts] == [
+        'C{}'.format(n) for n in range(22, 35)]
+    assert pages == [(22, 10), (32, 3)]
+
+
+def test_index_and_negative_slice(whispir, pages):
+    assert whispir.contacts.list()[7]['id'] == 'C7'
+    assert [c['id'] for c in whispir.contacts.list()[-2:]] == ['C43', 'C44']
+    with pytest.raises(IndexError):
+        whispir.contacts.list()[TOTAL]
+
+
+def test_count_from_metadata(whispir, pages):
+    assert whispir.contacts.list().count() == TOTAL
+    assert pages == [(0, 1)]
+
+
+def test_chunks(whispir, pages):
+    chunks = list(whispir.contacts.list().chunks(20))
+    assert [len(chunk) for chunk in chunks] == [20, 20, 5]
+
+
+def test_list_fields_projection(whispir, pages):
+    contacts = list(whispir.contacts.list(fields=['status'])[:2])
+    assert contacts == [{'id': 'C0'}, {'id': 'C1'}]
+    assert all(isinstance(contact, Contact) for contact in contacts)
+
+
+def test_show_fields_projection(whispir):
+    body = json.dumps({
+        'firstName': 'John',
+        'lastName': 'Wick',
+        'status': 'A',
+        'link': [{
+            'uri': 'https://api.whispir.com/contacts/C1',
+            'rel': 'self',
+            'method': 'GET'
+        }]
+    })
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts/C1.*'), body=body)
+
+    contact = whispir.contacts.show('C1', fields=['firstName', 'status'])
+    assert contact == {'id': 'C1', 'firstName': 'John', 'status': 'A'}
+
+    whispir.contacts.fields_param = 'fields'
+    whispir.contacts.show('C1', fields=['firstName', 'status'])
+    query = parse_qs(urlparse(httpretty.last_request().path).query)
+    assert query == {'fields': ['firstName,status']}
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` request scheduling"""
+
+import re
+import threading
+import time
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import DeadlineExceeded, Scheduler
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+def _wait_for_waiters(scheduler, count):
+    for _ in range(200):
+        if sum(len(queue) for queue in scheduler._queues.values()) == count:
+            return
+        time.sleep(0.01)
+    raise AssertionError('waiters did not queue up')
+
+
+def _start(scheduler, priority, order):
+    def run():
+        scheduler.acquire(priority)
+        order.append(priority)
+        scheduler.release()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_critical_jumps_queued_bulk():
+    scheduler = Scheduler(max_concurrency=1)
+    assert scheduler.acquire('bulk')
+    order = []
+    threads = [_start(scheduler, 'bulk', order) for _ in range(3)]
+    _wait_for_waiters(scheduler, 3)
+    threads.append(_start(scheduler, 'critical', order))
+    _wait_for_waiters(scheduler, 4)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(1)
+    assert order == ['critical', 'bulk', 'bulk', 'bulk']
+
+
+def test_weighted_shares():
+    scheduler = Scheduler(max_concurrency=1, weights={'normal': 2})
+    assert scheduler.acquire('normal')
+    order = []
+    threads = [_start(scheduler, name, order)
+               for name in ['bulk'] * 4 + ['normal'] * 4]
+    _wait_for_waiters(scheduler, 8)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(1)
+    # normal gets two turns for every bulk turn while both are waiting
+    assert order[:6].count('normal') == 4
+
+
+def test_acquire_timeout():
+    scheduler = Scheduler(rate=1)
+    assert scheduler.acquire('normal')
+    assert not scheduler.acquire('normal', timeout=0.05)
+    assert not scheduler._queues['normal']
+
+
+def test_whispir_request_scheduled():
+    scheduler = Scheduler(max_concurrency=1)
+    whispir = whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              scheduler=scheduler)
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'.*', re.M), body='{}')
+        assert whispir.request('get', 'workspaces') == {}
+        assert scheduler._in_flight == 0
+
+        scheduler.acquire('critical')
+        with whispir.deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                whispir.request('get', 'workspaces')
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` message status watching"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+import whispyr
+from whispyr import MessageStatus
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def status(name, email, sms=''):
+    return {
+        'name': name,
+        'status': [
+            {'type': 'email', 'status': email},
+            {'type': 'sms', 'status': sms},
+        ]
+    }
+
+
+@pytest.fixture
+def whispir(request):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY)
+
+
+@pytest.fixture
+def snapshots(whispir):
+    snapshots = {}
+
+    def message_status(request, uri, headers):
+        message_id = re.search(r'messages/(\w+)/', uri).group(1)
+        polls = snapshots[message_id]
+        body = polls.pop(0) if len(polls) > 1 else polls[0]
+        return 200, headers, json.dumps({'messageStatuses': body})
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/messagestatus.*'),
+        body=message_status)
+    return snapshots
+
+
+def test_watch_yields_changes_until_terminal(whispir, snapshots):
+    snapshots['M1'] = [
+        [status('john', 'PENDING'), status('jane', 'PENDING')],
+        [status('john', 'PENDING'), status('jane', 'PENDING')],
+        [status('john', 'DELIVERED'), status('jane', 'PENDING')],
+        [status('john', 'DELIVERED'), status('jane', 'FAILED')],
+    ]
+    clock = Clock()
+    message = whispir.messages.Message(id='M1')
+    changes = list(message.statuses.watch(clock=clock, sleep=clock.sleep))
+
+    assert [(p and p['name'], s['name']) for p, s in changes] == [
+        (None, 'john'), (None, 'jane'), ('john', 'john'), ('jane', 'jane')]
+    assert all(isinstance(s, MessageStatus) for _, s in changes)
+    assert changes[2][1]['status'][0]['status'] == 'DELIVERED'
+    # backs off while nothing changes, speeds up again on changes
+    assert clock.sleeps == [1, 2, 1]
+    assert 'view=detailed' in httpretty.last_request().path
+
+
+def test_watch_email_stops_at_sent(whispir, snapshots):
+    snapshots['M1'] = [[status('john', 'PENDING')],
+                       [status('john', 'SENT')]]
+    clock = Clock()
+    message = whispir.messages.Message(id='M1')
+    changes = [s['status'][0]['status']
+               for _, s in message.statuses.watch(clock=clock,
+                                                  sleep=clock.sleep)]
+
+    assert changes == ['PENDING', 'SENT']
+    assert len(clock.sleeps) == 1
+
+
+def test_watch_many_messages_with_timeout(whispir, snapshots):
+    snapshots['M1'] = [[status('john', 'PENDING')]]
+    snapshots['M2'] = [[status('jane', 'PENDING')],
+                       [status('jane', 'READ')]]
+    clock = Clock()
+    watcher = whispir.messages.watch(
+        ['M1', 'M2'], max_interval=8, timeout=30, clock=clock,
+        sleep=clock.sleep)
+    changes = [(m['id'], s['status'][0]['status'])
+               for m, _, s in watcher]
+
+    assert changes == [('M1', 'PENDING'), ('M2', 'PENDING'),
+                       ('M2', 'READ')]
+    assert clock.now < 30
+    assert max(clock.sleeps) == 8
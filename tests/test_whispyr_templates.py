@@ -2,9 +2,12 @@
 
 """Templates tests for `whispyr` package"""
 
+import json
 import pytest
 import uuid
 
+import httpretty
+
 from whispyr import Template, ClientError
 
 
@@ -125,3 +128,49 @@ def _check_template_instance(template):
     assert 'id' in template
     assert 'messageTemplateName' in template
     assert 'messageTemplateDescription' in template
+
+
+def test_render_template(whispir):
+    template = whispir.templates.Template(
+        id='1D6B3109B8FE38EA',
+        messageTemplateName='greeting',
+        messageTemplateDescription='Greeting template',
+        subject='Hi @@first_name@@',
+        body='Dear @@first_name@@ @@last_name@@, code: @@code@@',
+        email={'body': '@@first_name@@', 'footer': ''},
+        voice={})
+
+    message = template.render(to='61400000000', first_name='John', code=42)
+
+    assert message == {
+        'to': '61400000000',
+        'subject': 'Hi John',
+        'body': 'Dear John @@last_name@@, code: 42',
+        'email': {'body': 'John', 'footer': ''},
+        'voice': {}
+    }
+
+
+def test_render_many_fetches_template_once(whispir):
+    body = json.dumps({
+        'id': 'T1',
+        'messageTemplateName': 'greeting',
+        'subject': 'Hi @@first_name@@',
+        'body': 'Hello'
+    })
+    recipients = [{'to': str(n), 'first_name': 'John {}'.format(n)}
+                  for n in range(3)]
+
+    with httpretty.enabled():
+        httpretty.register_uri(
+            httpretty.GET, 'https://api.us.whispir.com/templates/T1',
+            body=body)
+        messages = list(whispir.templates.render_many('T1', recipients))
+        message = whispir.templates.render('T1', to='4', first_name='Jane')
+        assert len(httpretty.latest_requests()) == 1
+
+    assert messages == [
+        {'to': str(n), 'subject': 'Hi John {}'.format(n), 'body': 'Hello'}
+        for n in range(3)
+    ]
+    assert message == {'to': '4', 'subject': 'Hi Jane', 'body': 'Hello'}
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` tracing"""
+
+import json
+import re
+
+import httpretty
+import pytest
+
+from httpretty import HTTPretty
+
+import whispyr
+from whispyr import ClientError, InMemoryExporter, Tracer, WhispirRetry
+
+httpretty.HTTPretty.allow_net_connect = False
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+@pytest.fixture
+def exporter():
+    return InMemoryExporter()
+
+
+@pytest.fixture
+def whispir(exporter):
+    with httpretty.enabled():
+        yield whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                              tracer=Tracer(exporter), page_size=2,
+                              retry=WhispirRetry(total=3, backoff_factor=0))
+
+
+def test_request_span_with_retries(whispir, exporter):
+    httpretty.register_uri(
+        httpretty.POST, re.compile(r'.*/contacts', re.M),
+        responses=[
+            HTTPretty.Response(body='', status=503,
+                               adding_headers={'Retry-After': '0'}),
+            HTTPretty.Response(body='{"id": "C1"}', status=201),
+        ])
+
+    contact = whispir.contacts.create(firstName='John')
+    assert contact['id'] == 'C1'
+
+    create, = exporter.find('contacts.create')
+    request, = exporter.find('whispir.request')
+    assert request.parent_id == create.span_id
+    assert request.trace_id == create.trace_id
+    assert request.attributes['method'] == 'POST'
+    assert request.attributes['status'] == 201
+    assert request.attributes['retries'] == 1
+    assert request.attributes['request_bytes'] > 0
+    assert [event[0] for event in request.events] == ['retry', 'backoff']
+    assert create.attributes['collection'] == 'contacts'
+    assert create.duration >= request.duration
+
+
+def test_list_pages(whispir, exporter):
+    def list_contacts(request, uri, headers):
+        offset = int(re.search(r'offset=(\d+)', uri).group(1))
+        body = {'contacts': [{'id': 'C{}'.format(n)}
+                             for n in range(offset, min(offset + 2, 3))]}
+        if offset == 0:
+            body['link'] = [{
+                'rel': 'next',
+                'uri': 'https://api.whispir.com/contacts?limit=2&offset=2'
+            }]
+        return 200, headers, json.dumps(body)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*/contacts.*'), body=list_contacts)
+
+    tracer = whispir.tracer
+    with tracer.span('export', correlation_id='c0ffee') as root:
+        assert len(list(whispir.contacts.list())) == 3
+
+    listing, = exporter.find('contacts.list')
+    assert listing.parent_id == root.span_id
+    assert listing.attributes['items'] == 3
+    pages = exporter.children(listing)
+    assert [int(page.attributes['offset']) for page in pages] == [0, 2]
+    assert [page.attributes['items'] for page in pages] == [2, 1]
+    assert all(span.trace_id == 'c0ffee' for span in exporter.spans)
+
+
+def test_error_span(whispir, exporter):
+    httpretty.register_uri(
+        httpretty.DELETE, re.compile(r'.*', re.M), status=400, body='')
+    with pytest.raises(ClientError):
+        whispir.contacts.delete('C1')
+
+    delete, = exporter.find('contacts.delete')
+    request, = exporter.find('whispir.request')
+    assert request.attributes['status'] == 400
+    assert delete.error.startswith('ClientError')
+
+
+def test_opentelemetry_exporter(whispir):
+    sdk = pytest.importorskip('opentelemetry.sdk.trace')
+    in_memory = pytest.importorskip(
+        'opentelemetry.sdk.trace.export.in_memory_span_exporter')
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+    memory = in_memory.InMemorySpanExporter()
+    provider = sdk.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    exporter = whispyr.OpenTelemetryExporter(provider.get_tracer('tests'))
+    whispir.tracer = Tracer(exporter)
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'.*', re.M), body='{}')
+    whispir.contacts.show('C1')
+
+    request, show = memory.get_finished_spans()
+    assert request.parent.span_id == show.context.span_id
+    assert request.attributes['status'] == 200
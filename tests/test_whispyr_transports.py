@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for `whispyr` transports"""
+
+import functools
+
+import pytest
+from requests.exceptions import ConnectionError, Timeout
+
+import whispyr
+from whispyr import ClientError, HTTP2Transport, QuotaTracker, WhispirRetry
+
+httpx = pytest.importorskip('httpx')
+
+
+TEST_USERNAME = 'U53RN4M3'
+TEST_PASSWORD = 'P4ZZW0RD'
+TEST_API_KEY = 'V4L1D4P1K3Y'
+
+
+def _whispir(responses, requests, **kwargs):
+    responses = iter(responses)
+
+    def handler(request):
+        requests.append(request)
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    transport = functools.partial(
+        HTTP2Transport, transport=httpx.MockTransport(handler))
+    return whispyr.Whispir(TEST_USERNAME, TEST_PASSWORD, TEST_API_KEY,
+                           transport=transport, **kwargs)
+
+
+def test_http2_auth_and_user_agent():
+    requests = []
+    whispir = _whispir([httpx.Response(200, json={'id': 'W1'})], requests)
+
+    assert whispir.request('get', 'workspaces') == {'id': 'W1'}
+
+    request, = requests
+    assert str(request.url) == 'https://api.us.whispir.com/workspaces'
+    assert request.headers['x-api-key'] == TEST_API_KEY
+    assert request.headers['Authorization'].startswith('Basic ')
+    expected_agent = 'whispyr/{}'.format(whispyr.__version__)
+    assert request.headers['User-Agent'] == expected_agent
+
+
+def test_http2_retry_succeeded():
+    qps_headers = {
+        'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPS',
+        'Retry-After': '0'
+    }
+    requests = []
+    whispir = _whispir([
+        httpx.Response(403, headers=qps_headers),
+        httpx.Response(403, headers=qps_headers),
+        httpx.Response(200, json={}),
+    ], requests, quota=QuotaTracker(100))
+
+    assert whispir.request('get', 'workspaces') == {}
+    assert len(requests) == 3
+    assert whispir.quota.usage(TEST_API_KEY) == 3
+
+
+def test_http2_retry_limit():
+    qps_headers = {
+        'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPS',
+        'Retry-After': '0'
+    }
+    requests = []
+    whispir = _whispir([httpx.Response(403, headers=qps_headers)] * 3,
+                       requests, retry=WhispirRetry(total=1))
+
+    with pytest.raises(ClientError) as excinfo:
+        whispir.request('get', 'workspaces')
+
+    assert excinfo.value.response.status_code == 403
+    assert len(requests) == 2
+
+
+def test_http2_do_not_retry_qpd():
+    qpd_headers = {
+        'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPD',
+        'Retry-After': str(20 * 60 * 60)
+    }
+    requests = []
+    whispir = _whispir([
+        httpx.Response(403, headers=qpd_headers),
+        httpx.Response(200, json={}),
+    ], requests)
+
+    with pytest.raises(ClientError):
+        whispir.request('get', 'workspaces')
+    assert len(requests) == 1
+
+
+def test_http2_transport_errors_raised_as_requests_exceptions():
+    requests = []
+    whispir = _whispir([httpx.ConnectError('refused')] * 2, requests,
+                       retry=WhispirRetry(total=1, backoff_factor=0))
+
+    with pytest.raises(ConnectionError):
+        whispir.request('get', 'workspaces')
+    assert len(requests) == 2
+
+    whispir = _whispir([httpx.ReadTimeout('slow')], requests,
+                       retry=WhispirRetry(total=0))
+    with pytest.raises(Timeout):
+        whispir.request('get', 'workspaces')
@@ -6,19 +6,41 @@ __author__ = """Grigory Starinkin"""
 __email__ = 'starinkin@gmail.com'
 __version__ = '0.3.0'
 
-from .whispyr import Whispir, WhispirRetry
+from .whispyr import Whispir, WhispirRetry, MessageBatcher, SendQueue, \
+    RateLimiter, CircuitBreaker, Hedging, ResultSet, Scheduler, \
+    StatusWatcher, deadline, priority
 
 from .whispyr import Message, MessageStatus, MessageResponse, Template, \
     Workspace, ResponseRule, Contact, App
 
-from .whispyr import WhispirError, ClientError, ServerError, JSONDecodeError
+from .quota import QuotaTracker
+
+from .pool import WhispirPool
+
+from .query import F
+
+from .tracing import Tracer, Span, InMemoryExporter, OpenTelemetryExporter
+
+from .transports import Transport, RequestsTransport, HTTP2Transport, \
+    RecordingTransport, ReplayTransport, FaultInjectingTransport
+
+from .whispyr import WhispirError, ClientError, ServerError, \
+    JSONDecodeError, CircuitOpenError, DeadlineExceeded, QuotaExceeded
 
 __all__ = [
     # Client
-    'Whispir', 'WhispirRetry',
+    'Whispir', 'WhispirPool', 'WhispirRetry', 'MessageBatcher', 'SendQueue',
+    'RateLimiter', 'CircuitBreaker', 'Hedging', 'ResultSet', 'QuotaTracker',
+    'Scheduler', 'StatusWatcher', 'F', 'deadline', 'priority',
+    # Tracing
+    'Tracer', 'Span', 'InMemoryExporter', 'OpenTelemetryExporter',
+    # Transports
+    'Transport', 'RequestsTransport', 'HTTP2Transport', 'RecordingTransport',
+    'ReplayTransport', 'FaultInjectingTransport',
     # Resources
     'Message', 'MessageStatus', 'MessageResponse', 'Template', 'Workspace',
     'ResponseRule', 'Contact', 'App',
     # Errors
-    'WhispirError', 'ClientError', 'ServerError', 'JSONDecodeError'
+    'WhispirError', 'ClientError', 'ServerError', 'JSONDecodeError',
+    'CircuitOpenError', 'DeadlineExceeded', 'QuotaExceeded'
 ]
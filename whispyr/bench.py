@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of retry policies under injected faults.
+
+Run ``python -m whispyr.bench --help`` for options.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import functools
+import threading
+import time
+
+from requests.exceptions import RequestException
+
+from .tracing import Tracer, InMemoryExporter
+from .transports import Transport, FaultInjectingTransport, _response
+from .whispyr import Whispir, WhispirRetry, WhispirError, DEFAULT_RETRY
+
+DEFAULT_POLICIES = {
+    'default': DEFAULT_RETRY,
+    'no-retry': WhispirRetry(total=0),
+    'backoff': WhispirRetry(total=5, backoff_factor=0.2),
+}
+
+FAULTS = ('throttle_rate', 'unavailable_rate', 'qps_rate', 'qpd_rate',
+          'reset_rate', 'spike_rate', 'spike_latency', 'retry_after')
+
+
+def run(policies=None, requests=500, workers=8, latency=0.01, seed=None,
+        **faults):
+    """Send ``requests`` requests from ``workers`` threads with every
+    retry policy of ``policies`` (name -> policy) to a simulated API
+    answering in ``latency`` seconds, with ``faults`` injected by
+    ``FaultInjectingTransport``. Returns a report for every policy with
+    goodput (successful requests per second), p50/p99 latency of
+    requests (including retries) and the number of retries, of which
+    ``wasted_retries`` didn't make requests succeed in the end."""
+    policies = policies or DEFAULT_POLICIES
+    return [_run(name, policies[name], requests, workers, latency, seed,
+                 faults)
+            for name in sorted(policies)]
+
+
+def _run(name, policy, requests, workers, latency, seed, faults):
+    exporter = InMemoryExporter()
+    transport = functools.partial(
+        FaultInjectingTransport, transport=_SimulatedTransport,
+        latency=latency, seed=seed, **faults)
+    whispir = Whispir('bench', 'bench', 'bench', retry=policy,
+                      transport=transport, tracer=Tracer(exporter))
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            try:
+                whispir.request('get', 'workspaces')
+            except (WhispirError, RequestException):
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    spans = exporter.find('whispir.request')
+    latencies = sorted(span.duration for span in spans)
+    succeeded = retries = wasted_retries = 0
+    for span in spans:
+        span_retries = sum(1 for event in span.events if event[0] == 'retry')
+        retries += span_retries
+        if span.error is None:
+            succeeded += 1
+        else:
+            wasted_retries += span_retries
+    return {
+        'policy': name,
+        'requests': len(spans),
+        'succeeded': succeeded,
+        'goodput': succeeded / elapsed,
+        'p50': _percentile(latencies, 50),
+        'p99': _percentile(latencies, 99),
+        'retries': retries,
+        'wasted_retries': wasted_retries,
+        'injected': dict(whispir._transport.injected),
+    }
+
+
+class _SimulatedTransport(Transport):
+    """Answers every request successfully in ``latency`` seconds"""
+
+    def __init__(self, auth, retry, headers, latency=0.01):
+        super(_SimulatedTransport, self).__init__(auth, retry, headers)
+        self.latency = latency
+
+    def request(self, method, url, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return _response(url, 200, {'Content-Type': 'application/json'},
+                         '{}')
+
+
+def _percentile(values, percentile):
+    if not values:
+        return None
+    index = int(len(values) * percentile / 100.0)
+    return values[min(index, len(values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark whispyr retry policies under injected faults')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--seed', type=int)
+    for fault in FAULTS:
+        parser.add_argument('--' + fault.replace('_', '-'),
+                            type=int if fault == 'retry_after' else float)
+    args = vars(parser.parse_args(argv))
+    faults = {k: args[k] for k in FAULTS if args[k] is not None}
+
+    header = '{:<10} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}'
+    row = '{:<10} {:>9} {:>9.1f} {:>9.3f} {:>9.3f} {:>9} {:>9}'
+    print(header.format('policy', 'succeeded', 'goodput', 'p50', 'p99',
+                        'retries', 'wasted'))
+    for report in run(requests=args['requests'], workers=args['workers'],
+                      latency=args['latency'], seed=args['seed'], **faults):
+        print(row.format(
+            report['policy'],
+            '{}/{}'.format(report['succeeded'], report['requests']),
+            report['goodput'], report['p50'], report['p99'],
+            report['retries'], report['wasted_retries']))
+
+
+if __name__ == '__main__':
+    main()
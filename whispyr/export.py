@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""Columnar export of collection listings."""
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .whispyr import _chunked, _project, _raw_id
+
+
+def default_backend():
+    if pyarrow is not None:
+        return 'arrow'
+    if numpy is not None:
+        return 'numpy'
+    return 'python'
+
+
+def iter_batches(result_set, columns=None, batch_size=None, backend=None,
+                 schema=None):
+    """Convert a listing into columnar batches page by page.
+
+    Raw items are put into columns without building containers, so only
+    one batch is held in memory at a time. Items get an ``id`` from
+    their links where whispir doesn't list it. ``columns`` default to
+    the projected fields of the result set or to the attributes of
+    items in the first batch. Depending on ``backend`` every batch is a
+    ``pyarrow.RecordBatch`` (``'arrow'``), a dict of numpy arrays
+    (``'numpy'``) or a dict of lists (``'python'``). By default the
+    first available one is used.
+    """
+    backend = backend or default_backend()
+    convert = _CONVERTERS[backend]
+    batch_size = batch_size or result_set.collection.whispir.page_size
+    columns = columns or result_set.fields
+    for rows in _chunked(result_set._raw_items(), batch_size):
+        if result_set.fields is not None:
+            rows = [_project(row, result_set.fields) for row in rows]
+        else:
+            rows = [_with_id(row) for row in rows]
+        if columns is None:
+            columns = _columns(rows)
+        data = {c: [row.get(c) for row in rows] for c in columns}
+        yield convert(data, columns, schema)
+
+
+def write_parquet(result_set, path, columns=None, batch_size=None,
+                  schema=None):
+    """Write a listing into a parquet file batch by batch, returns the
+    number of written rows.
+
+    Unless ``schema`` is given, column types are inferred from the first
+    batch and later batches are cast to them. Columns without any value
+    in the first batch (like optional fields) are written as strings.
+    """
+    if pyarrow is None:
+        raise ImportError('write_parquet requires pyarrow, '
+                          'install it with `pip install whispyr[arrow]`')
+    writer = None
+    rows = 0
+    try:
+        for batch in iter_batches(result_set, columns, batch_size,
+                                  'arrow', schema):
+            if writer is None:
+                schema = schema or _known_types(batch.schema)
+                writer = pyarrow.parquet.ParquetWriter(path, schema)
+            table = pyarrow.Table.from_batches([batch])
+            writer.write_table(table.cast(schema))
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _with_id(row):
+    if 'id' in row:
+        return row
+    id = _raw_id(row)
+    if not id:
+        return row
+    with_id = {'id': id}
+    with_id.update(row)
+    return with_id
+
+
+def _known_types(schema):
+    # types of columns with only nulls so far can't be inferred yet
+    return pyarrow.schema([
+        field.with_type(pyarrow.string())
+        if pyarrow.types.is_null(field.type) else field
+        for field in schema])
+
+
+def _columns(rows):
+    columns = []
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return columns
+
+
+def _to_arrow(data, columns, schema):
+    if pyarrow is None:
+        raise ImportError('arrow backend requires pyarrow, '
+                          'install it with `pip install whispyr[arrow]`')
+    if schema is not None:
+        return pyarrow.RecordBatch.from_pydict(data, schema=schema)
+    arrays = [pyarrow.array(data[c]) for c in columns]
+    return pyarrow.RecordBatch.from_arrays(arrays, names=columns)
+
+
+def _to_numpy(data, columns, schema):
+    if numpy is None:
+        raise ImportError('numpy backend requires numpy, '
+                          'install it with `pip install whispyr[numpy]`')
+    batch = {}
+    for column in columns:
+        values = data[column]
+        dtype = schema.get(column) if schema else None
+        if dtype is None and any(isinstance(v, (dict, list, type(None)))
+                                 for v in values):
+            dtype = object
+        if dtype is object:
+            array = numpy.empty(len(values), dtype=object)
+            for i, value in enumerate(values):
+                array[i] = value
+        else:
+            array = numpy.array(values, dtype=dtype)
+        batch[column] = array
+    return batch
+
+
+def _to_python(data, columns, schema):
+    return data
+
+
+_CONVERTERS = {
+    'arrow': _to_arrow,
+    'numpy': _to_numpy,
+    'python': _to_python,
+}
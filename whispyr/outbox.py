@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+"""Durable outbox for messages."""
+
+import json
+import sqlite3
+import threading
+import time
+
+from .whispyr import ClientError, CircuitOpenError, DeadlineExceeded, \
+    QuotaExceeded, _over_daily_quota
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workspace TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    message_id TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, id);
+"""
+
+# client side refusals, whispir wasn't even asked so they aren't attempts
+_NOT_ATTEMPTED = (CircuitOpenError, DeadlineExceeded, QuotaExceeded)
+
+
+class Outbox(object):
+    """SQLite backed outbox for messages surviving process restarts.
+
+    ``add`` stores a message payload in the outbox. Writes are grouped
+    into transactions committed (and synced to disk) every
+    ``commit_interval`` seconds or ``commit_size`` writes, whichever comes
+    first; ``add`` returns only once its message is committed unless
+    ``durable=False`` is passed. ``drain`` (or ``run`` in a separate
+    drainer process) delivers pending messages through a ``Whispir``
+    client. Delivery is at-least-once: a message is marked sent only
+    after whispir accepted it. Failed attempts are retried after
+    ``backoff`` seconds, doubling with every attempt up to
+    ``max_backoff``, and the message fails for good after
+    ``max_attempts`` attempts, right away if whispir rejected it with
+    a client error other than throttling. Requests refused by the client
+    itself (open circuit, exceeded quota or deadline) don't count as
+    attempts, messages refused over the daily quota wait for its reset.
+    """
+
+    def __init__(self, path, commit_interval=0.05, commit_size=500,
+                 max_attempts=5, backoff=1.0, max_backoff=300,
+                 clock=time.time):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.commit_size = commit_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(_SCHEMA)
+        self._cond = threading.Condition()
+        self._uncommitted = 0
+        self._generation = 0
+        self._closed = False
+        self._committer = threading.Thread(target=self._run_committer)
+        self._committer.daemon = True
+        self._committer.start()
+
+    def add(self, workspace=None, durable=True, **payload):
+        return self.add_many([payload], workspace, durable)[0]
+
+    def add_many(self, payloads, workspace=None, durable=True):
+        now = time.time()
+        rows = [(workspace, json.dumps(payload), PENDING, now, now)
+                for payload in payloads]
+        ids = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('outbox is closed')
+            if not rows:
+                # nothing to wait for, the committer wouldn't commit
+                return ids
+            for row in rows:
+                cursor = self._db.execute(
+                    'INSERT INTO outbox '
+                    '(workspace, payload, state, created, updated) '
+                    'VALUES (?, ?, ?, ?, ?)', row)
+                ids.append(cursor.lastrowid)
+            self._uncommitted += len(rows)
+            generation = self._generation
+            if self._uncommitted >= self.commit_size:
+                self._commit()
+            elif durable:
+                while self._generation == generation:
+                    self._cond.wait()
+        return ids
+
+    def get(self, id):
+        with self._cond:
+            row = self._db.execute(
+                'SELECT id, workspace, payload, state, attempts, message_id, '
+                'error FROM outbox WHERE id = ?', (id,)).fetchone()
+        if row:
+            return _item(row)
+
+    def counts(self):
+        with self._cond:
+            rows = self._db.execute(
+                'SELECT state, COUNT(*) FROM outbox GROUP BY state')
+            return dict(rows.fetchall())
+
+    def pending(self, limit=100, after=0, due=None):
+        """Pending messages, only those due for an attempt at ``due``
+        time if given"""
+        if due is None:
+            due = float('inf')
+        with self._cond:
+            rows = self._db.execute(
+                'SELECT id, workspace, payload, state, attempts, message_id, '
+                'error FROM outbox WHERE state = ? AND id > ? '
+                'AND next_attempt <= ? ORDER BY id LIMIT ?',
+                (PENDING, after, due, limit)).fetchall()
+        return [_item(row) for row in rows]
+
+    def drain(self, whispir, batch_size=100):
+        """Make one delivery attempt for every pending message due for
+        one, returns number of sent messages"""
+        sent = 0
+        last_id = 0
+        due = self._clock()
+        while True:
+            items = self.pending(batch_size, after=last_id, due=due)
+            if not items:
+                return sent
+            for item in items:
+                sent += self._deliver(whispir, item)
+            last_id = items[-1]['id']
+            self.commit()
+
+    def run(self, whispir, interval=1.0, stop=None):
+        """Keep draining the outbox until ``stop`` event is set, waiting
+        ``interval`` seconds whenever nothing could be sent"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if not self.drain(whispir):
+                stop.wait(interval)
+
+    def commit(self):
+        with self._cond:
+            self._commit()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._committer.join()
+        self.commit()
+        self._db.close()
+
+    def _deliver(self, whispir, item):
+        messages = whispir.messages
+        if item['workspace']:
+            messages = whispir.workspaces.Workspace(
+                id=item['workspace']).messages
+        try:
+            message = messages.send(**item['payload'])
+        except _NOT_ATTEMPTED as e:
+            self._update(item['id'], PENDING, item['attempts'], None,
+                         repr(e))
+        except ClientError as e:
+            if not _over_daily_quota(e.response):
+                return self._failed(item, e, not _throttled(e.response))
+            # not an attempt either, whispir refuses everything until the
+            # quota resets
+            now = self._clock()
+            reset = now + SECONDS_PER_DAY - now % SECONDS_PER_DAY
+            self._update(item['id'], PENDING, item['attempts'], None,
+                         repr(e), reset)
+        except Exception as e:
+            return self._failed(item, e)
+        else:
+            self._update(item['id'], SENT, item['attempts'] + 1,
+                         message['id'], None)
+            return 1
+        return 0
+
+    def _failed(self, item, error, permanent=False):
+        attempts = item['attempts'] + 1
+        permanent = permanent or attempts >= self.max_attempts
+        state = FAILED if permanent else PENDING
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        self._update(item['id'], state, attempts, None, repr(error),
+                     self._clock() + delay)
+        return 0
+
+    def _update(self, id, state, attempts, message_id, error,
+                next_attempt=0):
+        with self._cond:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, attempts = ?, message_id = ?, '
+                'error = ?, next_attempt = ?, updated = ? WHERE id = ?',
+                (state, attempts, message_id, error, next_attempt,
+                 time.time(), id))
+            self._uncommitted += 1
+
+    def _commit(self):
+        if self._uncommitted:
+            self._db.commit()
+            self._uncommitted = 0
+        self._generation += 1
+        self._cond.notify_all()
+
+    def _run_committer(self):
+        with self._cond:
+            while not self._closed:
+                deadline = time.time() + self.commit_interval
+                while not self._closed:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if self._uncommitted:
+                    self._commit()
+
+
+def _throttled(response):
+    return (response.status_code == 429 or
+            response.headers.get('X-Mashery-Error-Code') ==
+            'ERR_403_DEVELOPER_OVER_QPS')
+
+
+def _item(row):
+    keys = ('id', 'workspace', 'payload', 'state', 'attempts', 'message_id',
+            'error')
+    item = dict(zip(keys, row))
+    item['payload'] = json.loads(item['payload'])
+    return item
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""Client pool spreading requests over several credentials."""
+
+import itertools
+import re
+import threading
+import time
+
+from requests.exceptions import RequestException
+
+from .whispyr import BaseWhispir, Whispir, ClientError, ServerError, \
+    QuotaExceeded, current_priority, _over_daily_quota, _ratio
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+_WORKSPACE_RE = re.compile(r'(?:^|/)workspaces/([^/?#]+)')
+
+
+def _shared(name):
+    return property(lambda self: getattr(self.members[0].client, name))
+
+
+class WhispirPool(BaseWhispir):
+    """``Whispir`` client spreading requests over several credentials.
+
+    ``credentials`` is a list of ``Whispir`` clients or dicts of their
+    arguments (``username``, ``password``, ``api_key`` and optionally
+    ``region``, ``base_url`` and ``name``); ``options`` are shared by
+    all of them. Every request goes to the least busy healthy member.
+    A member which ran out of its daily quota (whispir responded with
+    ``ERR_403_DEVELOPER_OVER_QPD`` or the member's ``QuotaTracker``
+    counted the whole daily limit) is skipped until the quota resets
+    and the request is retried on another one. Requests the tracker
+    refuses for their traffic class only are retried on another member
+    without blocking it for other classes. Members failing ``max_failures``
+    requests in a row are avoided for ``cooldown`` seconds. Open circuits
+    of a shared ``circuit_breaker`` are shared by all members as well, so
+    ``CircuitOpenError`` doesn't fail over.
+
+    Requests to a workspace stick to the member that served it first.
+    Workspaces only visible to some credentials can be pinned to them
+    with ``affinity`` (workspace id -> member name), these never fail
+    over.
+
+    Shared options are available as attributes of the pool like on a
+    single client (as configured on the first member), ``stats`` adds up
+    transfer stats of all members.
+    """
+
+    def __init__(self, credentials, page_size=20, hedging=None, tracer=None,
+                 affinity=None, max_failures=3, cooldown=30, clock=time.time,
+                 **options):
+        assert credentials, 'at least one credential has to be defined'
+        super(WhispirPool, self).__init__(page_size, hedging, tracer)
+        self.affinity = dict(affinity or {})
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._workspaces = {}
+        self._turn = itertools.count()
+        self.members = []
+        for i, credential in enumerate(credentials):
+            if isinstance(credential, Whispir):
+                name, client = i, credential
+            else:
+                credential = dict(options, page_size=page_size,
+                                  tracer=tracer, **credential)
+                name = credential.pop('name', i)
+                client = Whispir(**credential)
+            self.members.append(_Member(name, client))
+        self.stats = _PoolStats(self.members)
+
+    compress = _shared('compress')
+    compress_min_size = _shared('compress_min_size')
+    circuit_breaker = _shared('circuit_breaker')
+    timeout = _shared('timeout')
+    quota = _shared('quota')
+    scheduler = _shared('scheduler')
+
+    def url(self, path):
+        return self.members[0].client.url(path)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        workspace_id = _workspace_id(path)
+        pinned = workspace_id in self.affinity
+        tried = set()
+        error = None
+        while True:
+            member = self._choose(workspace_id, tried)
+            if member is None:
+                # no member left to fail over to
+                raise error or QuotaExceeded(current_priority())
+            tried.add(member.name)
+            try:
+                result = member.client.request(method, path, timeout,
+                                               **kwargs)
+            except QuotaExceeded as e:
+                # the tracker may only refuse this traffic class
+                quota = member.client.quota
+                if quota and quota.used_up(member.client._api_key):
+                    self._exhausted(member)
+                if pinned:
+                    raise
+                error = e
+            except ClientError as e:
+                if not _over_daily_quota(e.response):
+                    self._succeeded(member, None)
+                    raise
+                self._exhausted(member)
+                if pinned:
+                    raise
+                error = e
+            except (ServerError, RequestException):
+                self._failed(member)
+                raise
+            else:
+                self._succeeded(member, workspace_id)
+                return result
+            finally:
+                with self._lock:
+                    member.in_flight -= 1
+
+    def close(self):
+        super(WhispirPool, self).close()
+        for member in self.members:
+            member.client.close()
+
+    def _choose(self, workspace_id, tried):
+        now = self._clock()
+        with self._lock:
+            available = [m for m in self.members
+                         if m.name not in tried and m.exhausted_until <= now]
+            if workspace_id in self.affinity:
+                name = self.affinity[workspace_id]
+                available = [m for m in available if m.name == name]
+            if not available:
+                return None
+            sticky = self._workspaces.get(workspace_id)
+            healthy = [m for m in available if m.unhealthy_until <= now]
+            for member in healthy:
+                if member.name == sticky:
+                    break
+            else:
+                # all members failing is no reason to stop trying them
+                candidates = healthy or available
+                turn = next(self._turn)
+                member = min(candidates, key=lambda m: (
+                    m.in_flight,
+                    (candidates.index(m) - turn) % len(candidates)))
+            member.in_flight += 1
+            return member
+
+    def _exhausted(self, member):
+        now = self._clock()
+        with self._lock:
+            member.exhausted_until = (now + SECONDS_PER_DAY -
+                                      now % SECONDS_PER_DAY)
+
+    def _failed(self, member):
+        with self._lock:
+            member.failures += 1
+            if member.failures >= self.max_failures:
+                member.unhealthy_until = self._clock() + self.cooldown
+
+    def _succeeded(self, member, workspace_id):
+        with self._lock:
+            member.failures = 0
+            member.unhealthy_until = 0
+            if workspace_id is not None:
+                self._workspaces[workspace_id] = member.name
+
+
+class _PoolStats(object):
+    """``TransferStats`` of all members added up"""
+
+    def __init__(self, members):
+        self._members = members
+
+    def _sum(self, name):
+        return sum(getattr(m.client.stats, name) for m in self._members)
+
+    @property
+    def sent_bytes(self):
+        return self._sum('sent_bytes')
+
+    @property
+    def sent_wire_bytes(self):
+        return self._sum('sent_wire_bytes')
+
+    @property
+    def received_bytes(self):
+        return self._sum('received_bytes')
+
+    @property
+    def received_wire_bytes(self):
+        return self._sum('received_wire_bytes')
+
+    @property
+    def request_ratio(self):
+        return _ratio(self.sent_bytes, self.sent_wire_bytes)
+
+    @property
+    def response_ratio(self):
+        return _ratio(self.received_bytes, self.received_wire_bytes)
+
+
+class _Member(object):
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.in_flight = 0
+        self.failures = 0
+        self.unhealthy_until = 0
+        self.exhausted_until = 0
+
+
+def _workspace_id(path):
+    match = _WORKSPACE_RE.search(path)
+    return match.group(1) if match else None
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""Filter expressions for collection listings."""
+
+import operator
+
+
+class Expression(object):
+    """Condition on raw items of a listing, combine with ``&``, ``|``
+    and ``~``"""
+
+    def matches(self, item):
+        raise NotImplementedError
+
+    def conjuncts(self):
+        return [self]
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class F(object):
+    """Reference to an item field (``status.type`` for nested fields)
+    used to build expressions: ``F('lastName') == 'Wick'``"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Compare(self.name, 'eq', value)
+
+    def __ne__(self, value):
+        return Compare(self.name, 'ne', value)
+
+    def __lt__(self, value):
+        return Compare(self.name, 'lt', value)
+
+    def __le__(self, value):
+        return Compare(self.name, 'le', value)
+
+    def __gt__(self, value):
+        return Compare(self.name, 'gt', value)
+
+    def __ge__(self, value):
+        return Compare(self.name, 'ge', value)
+
+    __hash__ = object.__hash__
+
+    def isin(self, values):
+        return Compare(self.name, 'in', frozenset(values))
+
+    def contains(self, value):
+        return Compare(self.name, 'contains', value)
+
+    def startswith(self, value):
+        return Compare(self.name, 'startswith', value)
+
+
+class Compare(Expression):
+
+    OPERATORS = {
+        'eq': operator.eq,
+        'ne': operator.ne,
+        'lt': operator.lt,
+        'le': operator.le,
+        'gt': operator.gt,
+        'ge': operator.ge,
+        'in': lambda field, values: field in values,
+        'contains': lambda field, value: value in field,
+        'startswith': lambda field, value: field.startswith(value),
+    }
+
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        self.value = value
+        self._path = field.split('.')
+        self._compare = self.OPERATORS[op]
+
+    def matches(self, item):
+        value = item
+        for key in self._path:
+            if not isinstance(value, dict) or key not in value:
+                return self.op == 'ne'
+            value = value[key]
+        try:
+            return self._compare(value, self.value)
+        except (TypeError, AttributeError):
+            return False
+
+    def __repr__(self):
+        return 'F({!r}) {} {!r}'.format(self.field, self.op, self.value)
+
+
+class And(Expression):
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def matches(self, item):
+        return all(part.matches(item) for part in self.parts)
+
+    def conjuncts(self):
+        return [it for part in self.parts for it in part.conjuncts()]
+
+
+class Or(Expression):
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def matches(self, item):
+        return any(part.matches(item) for part in self.parts)
+
+
+class Not(Expression):
+
+    def __init__(self, part):
+        self.part = part
+
+    def matches(self, item):
+        return not self.part.matches(item)
+
+
+class Param(object):
+    """Query parameter a comparison can be pushed down to. Comparisons
+    whispir applies ``exact``-ly aren't checked again client side,
+    ``format`` converts compared values into parameter values."""
+
+    def __init__(self, name, exact=False, format=None):
+        self.name = name
+        self.exact = exact
+        self.format = format
+
+    def value(self, value):
+        return self.format(value) if self.format else value
+
+
+def plan(expression, params):
+    """Split ``expression`` into query parameters (comparisons joined by
+    ``&`` found in ``params``, a ``{(field, op): Param}`` mapping) and
+    the rest of it to evaluate client side (None if nothing's left)"""
+    query = {}
+    residual = []
+    for part in expression.conjuncts():
+        param = (isinstance(part, Compare) and
+                 params.get((part.field, part.op)))
+        if param and param.name not in query:
+            query[param.name] = param.value(part.value)
+            if param.exact:
+                continue
+        residual.append(part)
+    if not residual:
+        return query, None
+    if len(residual) == 1:
+        return query, residual[0]
+    return query, And(*residual)
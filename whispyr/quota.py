@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""Daily quota accounting."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .whispyr import QuotaExceeded
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# forecasts extrapolate at least an hour of usage to avoid wild estimates
+# right after the quota reset
+MIN_FORECAST_PERIOD = 60 * 60
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class QuotaTracker(object):
+    """Counts requests per API key and (UTC) day against ``daily_limit``.
+
+    Every traffic class may use its share of the daily limit (``shares``):
+    by default bulk traffic stops at 70%, normal at 90% and critical
+    traffic may use the whole quota. Once the forecast of a day's usage
+    (current rate extrapolated to the end of the day) exceeds a class
+    share, requests of that class are paced to spread the rest of its
+    share over the rest of the day. Requests over the share raise
+    ``QuotaExceeded``.
+
+    Whispir bills every request reaching it, so retries count as well
+    while requests refused by the client never do.
+
+    Counters are saved to ``path`` (if given) every ``save_interval``
+    requests and loaded back on start, so restarts don't reset them.
+    """
+
+    DEFAULT_SHARES = {'critical': 1.0, 'normal': 0.9, 'bulk': 0.7}
+
+    def __init__(self, daily_limit, path=None, shares=None, save_interval=20,
+                 clock=time.time, sleep=time.sleep):
+        self.daily_limit = daily_limit
+        self.path = path
+        self.shares = dict(self.DEFAULT_SHARES, **(shares or {}))
+        self.save_interval = save_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._next_slot = {}
+        self._unsaved = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._counts = json.load(f)
+
+    def usage(self, api_key):
+        with self._lock:
+            return self._counter(api_key)['count']
+
+    def used_up(self, api_key):
+        """Whether the whole daily limit of ``api_key`` is used"""
+        return self.usage(api_key) >= self.daily_limit
+
+    def forecast(self, api_key):
+        """Projected number of requests by the end of the day"""
+        with self._lock:
+            return self._forecast(self._counter(api_key))
+
+    def acquire(self, api_key, priority='normal'):
+        with self._lock:
+            counter = self._counter(api_key)
+            share = self.shares[priority] * self.daily_limit
+            if counter['count'] >= share:
+                raise QuotaExceeded(priority)
+
+            delay = 0
+            if self._forecast(counter) > share:
+                now = self._clock()
+                interval = (self._seconds_left(now) /
+                            (share - counter['count']))
+                slot_key = (api_key, priority)
+                slot = max(self._next_slot.get(slot_key, now), now)
+                self._next_slot[slot_key] = slot + interval
+                delay = slot - now
+
+            counter['count'] += 1
+            self._unsaved += 1
+            if self._unsaved >= self.save_interval:
+                self._save()
+
+        if delay > 0:
+            self._sleep(delay)
+
+    def record(self, api_key, count):
+        """Adjust usage of ``api_key`` by ``count`` requests: retries sent
+        on top of acquired requests, or acquired requests which were
+        never sent when negative"""
+        with self._lock:
+            counter = self._counter(api_key)
+            counter['count'] = max(counter['count'] + count, 0)
+            self._unsaved += abs(count)
+            if self._unsaved >= self.save_interval:
+                self._save()
+
+    def exhausted(self, api_key):
+        """Record that whispir reported the daily quota as used up"""
+        with self._lock:
+            counter = self._counter(api_key)
+            counter['count'] = max(counter['count'], self.daily_limit)
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _counter(self, api_key):
+        key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        day = time.strftime('%Y-%m-%d', time.gmtime(self._clock()))
+        counter = self._counts.get(key)
+        if counter is None or counter['day'] != day:
+            counter = self._counts[key] = {'day': day, 'count': 0}
+        return counter
+
+    def _forecast(self, counter):
+        now = self._clock()
+        elapsed = SECONDS_PER_DAY - self._seconds_left(now)
+        return (counter['count'] * SECONDS_PER_DAY /
+                float(max(elapsed, MIN_FORECAST_PERIOD)))
+
+    def _seconds_left(self, now):
+        return SECONDS_PER_DAY - now % SECONDS_PER_DAY
+
+    def _save(self):
+        self._unsaved = 0
+        if not self.path:
+            return
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump(self._counts, f)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp_path, self.path)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""Request tracing."""
+
+import binascii
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def _new_id(size):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+class Span(object):
+    """Timed operation. Spans of one trace share ``trace_id`` which
+    serves as the correlation id of everything done within the trace.
+    Ids have OpenTelemetry sizes (16 bytes trace, 8 bytes span ids)."""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.error = None
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def duration(self):
+        if self.end is not None:
+            return self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, **attributes):
+        self.events.append((name, time.time(), attributes))
+
+    def __repr__(self):
+        return '<Span {} {}/{}>'.format(self.name, self.trace_id,
+                                        self.span_id)
+
+
+def current_span():
+    spans = getattr(_local, 'spans', None)
+    return spans[-1] if spans else None
+
+
+@contextmanager
+def activate(span):
+    """Make ``span`` the parent of spans started by this thread within the
+    block"""
+    if span is None:
+        yield span
+        return
+    spans = _local.__dict__.setdefault('spans', [])
+    spans.append(span)
+    try:
+        yield span
+    finally:
+        spans.pop()
+
+
+class Tracer(object):
+    """Records spans of whispyr operations and hands them to ``exporter``.
+
+    Spans nest within a thread (and follow work handed to helper
+    threads): a span started while another one is active becomes its
+    child and shares its trace id, a new trace id is generated for root
+    spans unless ``correlation_id`` is given.
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name, parent=None, correlation_id=None, **attributes):
+        span = self.start_span(name, parent, correlation_id, **attributes)
+        try:
+            with activate(span):
+                yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+
+    def start_span(self, name, parent=None, correlation_id=None,
+                   **attributes):
+        parent = parent or current_span()
+        if correlation_id is None:
+            correlation_id = parent.trace_id if parent else _new_id(16)
+        span = Span(name, correlation_id, parent and parent.span_id,
+                    attributes)
+        self.exporter.start(span)
+        return span
+
+    def end_span(self, span, error=None):
+        if error is not None:
+            span.error = '{}: {}'.format(type(error).__name__, error)
+        span.end = time.time()
+        self.exporter.end(span)
+
+    def trace_iter(self, name, iterable, **attributes):
+        """Trace consumption of ``iterable`` as one span, spans started
+        while fetching items become its children"""
+        span = self.start_span(name, **attributes)
+        count = 0
+        error = None
+        try:
+            iterator = iter(iterable)
+            while True:
+                with activate(span):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                count += 1
+                yield item
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            span.set_attribute('items', count)
+            self.end_span(span, error)
+
+
+class Exporter(object):
+    """Receives spans as they start and end"""
+
+    def start(self, span):
+        pass
+
+    def end(self, span):
+        pass
+
+
+class InMemoryExporter(Exporter):
+    """Keeps finished spans in memory, mainly for tests"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def end(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name):
+        return [span for span in self.spans if span.name == name]
+
+    def children(self, span):
+        return [it for it in self.spans if it.parent_id == span.span_id]
+
+    def clear(self):
+        with self._lock:
+            del self.spans[:]
+
+
+class OpenTelemetryExporter(Exporter):
+    """Mirrors spans into an OpenTelemetry ``tracer`` (the global tracer
+    provider's one by default)"""
+
+    def __init__(self, tracer=None):
+        self._trace = _import_opentelemetry()
+        if tracer is None:
+            from . import __version__
+            tracer = self._trace.get_tracer('whispyr', __version__)
+        self._tracer = tracer
+        self._spans = {}
+
+    def start(self, span):
+        parent = self._spans.get(span.parent_id)
+        context = parent and self._trace.set_span_in_context(parent)
+        self._spans[span.span_id] = self._tracer.start_span(
+            span.name, context=context, start_time=_nanoseconds(span.start))
+
+    def end(self, span):
+        otel_span = self._spans.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        otel_span.set_attribute('whispyr.correlation_id', span.trace_id)
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value)
+        for name, timestamp, attributes in span.events:
+            otel_span.add_event(name, attributes,
+                                timestamp=_nanoseconds(timestamp))
+        if span.error:
+            status = self._trace.Status(self._trace.StatusCode.ERROR,
+                                        span.error)
+            otel_span.set_status(status)
+        otel_span.end(end_time=_nanoseconds(span.end))
+
+
+def _nanoseconds(timestamp):
+    return int(timestamp * 1e9)
+
+
+def _import_opentelemetry():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        raise ImportError('OpenTelemetryExporter requires opentelemetry-api, '
+                          'install it with `pip install whispyr[otel]`')
+    return trace
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""HTTP transports used by the whispir client."""
+
+import gzip
+import io
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests import exceptions
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from six import text_type
+from six.moves.urllib.parse import urlsplit, parse_qsl, urlencode
+
+from urllib3.exceptions import MaxRetryError
+
+
+class Transport(object):
+    """Base class for transports.
+
+    A transport is created with an auth callable, a ``urllib3`` compatible
+    retry policy and default headers. ``request`` sends a request to an
+    absolute URL and returns a response object exposing ``status_code``,
+    ``headers``, ``content`` and ``json()``. Transport level errors have
+    to be raised as ``requests`` exceptions (``ConnectionError``,
+    ``Timeout`` and their subclasses) whatever the underlying library,
+    the client and its callers only handle these. Transports applying the
+    retry policy themselves set ``retries`` of responses to the final
+    retry state (like ``urllib3`` responses have it), so retried
+    attempts count against quotas.
+    """
+
+    def __init__(self, auth, retry, headers):
+        self.auth = auth
+        self.retry = retry
+        self.headers = headers
+
+    def request(self, method, url, **kwargs):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """HTTP/1.1 transport backed by a ``requests`` session."""
+
+    def __init__(self, auth, retry, headers, pool_maxsize=10):
+        super(RequestsTransport, self).__init__(auth, retry, headers)
+        self.session = Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(headers)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class HTTP2Transport(Transport):
+    """HTTP/2 transport backed by ``httpx``.
+
+    Concurrent requests from multiple threads are multiplexed as streams
+    over up to ``max_connections`` connections. The retry policy is
+    applied the same way ``HTTPAdapter`` applies it. Extra keyword
+    arguments are passed to ``httpx.Client``. Requires the ``http2``
+    extra (``pip install whispyr[http2]``).
+    """
+
+    def __init__(self, auth, retry, headers, max_connections=4,
+                 **client_options):
+        self._httpx = httpx = _import_httpx()
+        super(HTTP2Transport, self).__init__(auth, retry, headers)
+        limits = httpx.Limits(max_connections=max_connections)
+        client_options.setdefault('http2', True)
+        client_options.setdefault('limits', limits)
+        self.client = httpx.Client(auth=auth, headers=headers,
+                                   **client_options)
+
+    def request(self, method, url, **kwargs):
+        httpx = self._httpx
+        method = method.upper()
+        if isinstance(kwargs.get('data'), bytes):
+            kwargs['content'] = kwargs.pop('data')
+        if isinstance(kwargs.get('timeout'), tuple):
+            connect, read = kwargs['timeout']
+            kwargs['timeout'] = httpx.Timeout(read, connect=connect)
+
+        return _retrying(
+            self.retry, method, url,
+            lambda: self._send(method, url, **kwargs),
+            exceptions.RequestException)
+
+    def _send(self, method, url, **kwargs):
+        httpx = self._httpx
+        try:
+            return self.client.request(method, url, **kwargs)
+        except httpx.ConnectTimeout as e:
+            raise exceptions.ConnectTimeout(e)
+        except httpx.ReadTimeout as e:
+            raise exceptions.ReadTimeout(e)
+        except httpx.TimeoutException as e:
+            raise exceptions.Timeout(e)
+        except httpx.TransportError as e:
+            raise exceptions.ConnectionError(e)
+
+    def close(self):
+        self.client.close()
+
+
+# response headers worth keeping in recordings
+RECORDED_HEADERS = ('Content-Type', 'Location', 'Retry-After',
+                    'X-Mashery-Error-Code', 'X-Mashery-Error-Detail')
+
+
+class RecordingTransport(Transport):
+    """Records responses of another transport (``RequestsTransport`` by
+    default, created with ``options``) into a JSON lines file at
+    ``path``, gzipped if it ends with ``.gz``. Only the method, path and
+    query of requests are recorded (no credentials or request bodies),
+    along with the response status, a few headers, body and latency.
+    """
+
+    def __init__(self, auth, retry, headers, path,
+                 transport=RequestsTransport, **options):
+        super(RecordingTransport, self).__init__(auth, retry, headers)
+        self.transport = transport(auth, retry, headers, **options)
+        self.path = path
+        self._file = _open(path, 'w')
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        start = time.time()
+        response = self.transport.request(method, url, **kwargs)
+        record = {
+            'method': method.upper(),
+            'path': _request_key(url, kwargs.get('params')),
+            'status': response.status_code,
+            'headers': {name: response.headers[name]
+                        for name in RECORDED_HEADERS
+                        if name in response.headers},
+            'body': response.content.decode('utf-8', 'replace'),
+            'elapsed': round(time.time() - start, 4),
+        }
+        line = text_type(json.dumps(record, separators=(',', ':'))) + '\n'
+        with self._lock:
+            self._file.write(line)
+        return response
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """Replays responses recorded by ``RecordingTransport`` at ``path``.
+
+    Requests are answered with recorded responses to the same method,
+    path and query, or to the same route (path with IDs ignored) if
+    there are none. Recorded responses are served in turn and reused
+    once exhausted, so a short recording can drive a long load test.
+    Every response is delayed by its recorded latency divided by
+    ``speed`` (no delay if ``speed`` is None). ``error_rate`` of
+    requests fail with ``error_status`` (with ``Retry-After`` of
+    ``retry_after`` seconds unless None). The retry policy is applied
+    the same way ``HTTPAdapter`` applies it.
+    """
+
+    def __init__(self, auth, retry, headers, path, speed=1.0, error_rate=0,
+                 error_status=503, retry_after=1, seed=None,
+                 sleep=time.sleep):
+        super(ReplayTransport, self).__init__(auth, retry, headers)
+        self.speed = speed
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        records = {}
+        with _open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                key = (record['method'], record['path'])
+                route = (record['method'], _route(record['path']))
+                records.setdefault(key, []).append(record)
+                if route != key:
+                    records.setdefault(route, []).append(record)
+        self._records = {key: itertools.cycle(it)
+                         for key, it in records.items()}
+
+    def request(self, method, url, **kwargs):
+        method = method.upper()
+        path = _request_key(url, kwargs.get('params'))
+        return _retrying(self.retry, method, url,
+                         lambda: self._replay(method, url, path))
+
+    def _replay(self, method, url, path):
+        with self._lock:
+            records = (self._records.get((method, path)) or
+                       self._records.get((method, _route(path))))
+            if records is None:
+                raise LookupError('no recorded response for {} {}'.format(
+                    method, path))
+            record = next(records)
+            failed = self._random.random() < self.error_rate
+
+        if self.speed:
+            self._sleep(record['elapsed'] / self.speed)
+        if failed:
+            headers = {}
+            if self.retry_after is not None:
+                headers['Retry-After'] = str(self.retry_after)
+            return _response(url, self.error_status, headers, '')
+        return _response(url, record['status'], record['headers'],
+                         record['body'])
+
+
+class FaultInjectingTransport(Transport):
+    """Injects faults into requests sent by another transport
+    (``RequestsTransport`` by default, created with ``options``).
+
+    Each rate is the probability of a fault per request attempt:
+    ``throttle_rate`` of 429 and ``unavailable_rate`` of 503 responses,
+    ``qps_rate`` and ``qpd_rate`` of Mashery 403 over-QPS and over-QPD
+    responses, ``reset_rate`` of connection resets and ``spike_rate``
+    of latency spikes of ``spike_latency`` seconds. Throttling responses
+    carry ``Retry-After`` of ``retry_after`` seconds. The retry policy
+    is applied here (the wrapped transport doesn't retry), so injected
+    faults are retried like real ones. ``injected`` counts injected
+    faults by kind.
+    """
+
+    def __init__(self, auth, retry, headers, transport=RequestsTransport,
+                 throttle_rate=0, unavailable_rate=0, qps_rate=0, qpd_rate=0,
+                 reset_rate=0, spike_rate=0, spike_latency=2, retry_after=1,
+                 seed=None, sleep=time.sleep, **options):
+        super(FaultInjectingTransport, self).__init__(auth, retry, headers)
+        self.transport = transport(auth, retry.new(total=0), headers,
+                                   **options)
+        retry_after = {'Retry-After': str(retry_after)}
+        self.faults = [
+            ('throttle', throttle_rate, 429, retry_after),
+            ('unavailable', unavailable_rate, 503, retry_after),
+            ('qps', qps_rate, 403, dict(
+                retry_after, **{'X-Mashery-Error-Code':
+                                'ERR_403_DEVELOPER_OVER_QPS'})),
+            ('qpd', qpd_rate, 403, {
+                'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPD'}),
+        ]
+        self.reset_rate = reset_rate
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self.injected = collections.Counter()
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        method = method.upper()
+        return _retrying(self.retry, method, url,
+                         lambda: self._attempt(method, url, **kwargs),
+                         exceptions.RequestException)
+
+    def _attempt(self, method, url, **kwargs):
+        with self._lock:
+            spike = self._random.random() < self.spike_rate
+            reset = self._random.random() < self.reset_rate
+            roll = self._random.random()
+            fault = None
+            for fault in self.faults:
+                roll -= fault[1]
+                if roll < 0:
+                    break
+            else:
+                fault = None
+            for kind, injected in [('spike', spike), ('reset', reset)]:
+                if injected:
+                    self.injected[kind] += 1
+            if fault and not reset:
+                self.injected[fault[0]] += 1
+
+        if spike:
+            self._sleep(self.spike_latency)
+        if reset:
+            raise exceptions.ConnectionError('connection reset (injected)')
+        if fault:
+            _, _, status, headers = fault
+            return _response(url, status, headers, '')
+        return self.transport.request(method, url, **kwargs)
+
+    def close(self):
+        self.transport.close()
+
+
+def _retrying(retry, method, url, send, errors=()):
+    """Apply ``retry`` policy to ``send()`` the way ``HTTPAdapter``
+    applies it"""
+    while True:
+        try:
+            response = send()
+        except errors as e:
+            try:
+                retry = retry.increment(method, url, error=e)
+            except MaxRetryError:
+                raise e
+            retry.sleep()
+            continue
+
+        # exposed like urllib3 responses expose it, for quota accounting
+        response.retries = retry
+        has_retry_after = 'Retry-After' in response.headers
+        if not retry.is_retry(method, response.status_code,
+                              has_retry_after):
+            return response
+
+        try:
+            retry = retry.increment(
+                method, url, response=_RetryResponse(response))
+        except MaxRetryError:
+            return response
+        retry.sleep(_RetryResponse(response))
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'),
+                                encoding='utf-8')
+    return io.open(path, mode, encoding='utf-8')
+
+
+def _request_key(url, params=None):
+    # query of the URL and ``params`` the way requests encodes them
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if isinstance(params, dict):
+        params = params.items()
+    for name, values in params or ():
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        query.extend((name, text_type(value)) for value in values
+                     if value is not None)
+    query.sort()
+    if query:
+        return '{}?{}'.format(parts.path, urlencode(query))
+    return parts.path
+
+
+_ID_RE = re.compile(r'(/[^/]+/)[^/]+')
+
+
+def _route(path):
+    # resources and IDs alternate in whispir paths
+    return _ID_RE.sub(r'\1*', path.split('?')[0])
+
+
+def _response(url, status, headers, body):
+    response = Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = 'utf-8'
+    response._content = body.encode('utf-8')
+    return response
+
+
+def _import_httpx():
+    # httpx is an optional dependency and it's slow to import, so it's
+    # imported only when HTTP/2 transport is actually used
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError('HTTP2Transport requires httpx, '
+                          'install it with `pip install whispyr[http2]`')
+    return httpx
+
+
+class _RetryResponse(object):
+    """Just enough of ``urllib3.HTTPResponse`` for retry policies"""
+
+    def __init__(self, response):
+        self.status = response.status_code
+        self.headers = response.headers
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def get_redirect_location(self):
+        return False
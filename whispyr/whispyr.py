@@ -2,18 +2,45 @@
 
 """Main module."""
 
+import gzip
+import io
+import itertools
+import json
+import re
+import threading
+import time
+
 from . import __version__
 
-from six.moves import UserDict
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from six import string_types, text_type
+from six.moves import UserDict, queue
 from six.moves.urllib.parse import urljoin, urlparse, parse_qsl
 
-from requests import Session
-from requests.adapters import HTTPAdapter
-from requests.auth import HTTPBasicAuth, AuthBase
+from requests.auth import AuthBase, _basic_auth_str
+from requests.exceptions import RequestException
 
 from urllib3.util import Retry
 from urllib3.exceptions import MaxRetryError
 
+from .query import Expression, Param, plan
+from .tracing import activate, current_span
+from .transports import RequestsTransport
+
+try:
+    import brotli  # noqa: F401
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+    except ImportError:
+        brotli = None
+    else:
+        brotli = True
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
 
 class WhispirError(Exception):
 
@@ -34,16 +61,39 @@ class JSONDecodeError(WhispirError):
     pass
 
 
+class QuotaExceeded(WhispirError):
+
+    def __init__(self, priority):
+        super(QuotaExceeded, self).__init__(None)
+        self.priority = priority
+
+
+class DeadlineExceeded(WhispirError):
+
+    def __init__(self):
+        super(DeadlineExceeded, self).__init__(None)
+
+
+class CircuitOpenError(WhispirError):
+
+    def __init__(self, endpoint, retry_after):
+        super(CircuitOpenError, self).__init__(None)
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
 class WhispirAuth(AuthBase):
 
     def __init__(self, api_key, username, password):
         self._api_key = api_key
-        self._basic_auth = HTTPBasicAuth(username, password)
+        self._headers = {
+            'Authorization': _basic_auth_str(username, password),
+            'x-api-key': api_key
+        }
 
     def __call__(self, request):
-        new_req = self._basic_auth(request)
-        new_req.headers.update({'x-api-key': self._api_key})
-        return new_req
+        request.headers.update(self._headers)
+        return request
 
 
 class WhispirRetry(Retry):
@@ -60,56 +110,622 @@ class WhispirRetry(Retry):
     def increment(self, method=None, url=None, response=None, error=None,
                   _pool=None, _stacktrace=None):
         if response:
-            mashery_error = response.getheader("X-Mashery-Error-Code")
-            if mashery_error == 'ERR_403_DEVELOPER_OVER_QPD':
+            if _over_daily_quota(response):
+                raise MaxRetryError(_pool, url, error)
+        deadline = current_deadline()
+        if deadline:
+            wait = (response and self.get_retry_after(response)) or 0
+            if wait >= deadline.remaining():
                 raise MaxRetryError(_pool, url, error)
-        return super(WhispirRetry, self).increment(
+        retry = super(WhispirRetry, self).increment(
             method=method, url=url, response=response, error=error,
             _pool=_pool, _stacktrace=_stacktrace)
+        span = current_span()
+        if span:
+            span.add_event('retry', status=response and response.status,
+                           error=error and repr(error))
+        return retry
+
+    def sleep(self, response=None):
+        span = current_span()
+        if not span:
+            return super(WhispirRetry, self).sleep(response)
+        start = time.time()
+        super(WhispirRetry, self).sleep(response)
+        span.add_event('backoff', seconds=time.time() - start)
 
 
 DEFAULT_RETRY = WhispirRetry()
 
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+
+_local = threading.local()
+
+
+class _lazy(object):
+    """Attribute computed on first access and stored in the instance"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return obj.__dict__.setdefault(self.name, self.factory(obj))
+
+
+class _NoSpan(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Deadline(object):
+
+    def __init__(self, timeout):
+        self.expires = time.time() + timeout
+
+    def remaining(self):
+        return self.expires - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(timeout):
+    """Bound all requests (including pagination and retries) made by this
+    thread within the block by ``timeout`` seconds. Nested deadlines
+    can't extend outer ones. Requests after the deadline raise
+    ``DeadlineExceeded``."""
+    previous = current_deadline()
+    new = timeout if isinstance(timeout, Deadline) else Deadline(timeout)
+    if previous and previous.expires < new.expires:
+        new = previous
+    _local.deadline = new
+    try:
+        yield new
+    finally:
+        _local.deadline = previous
+
+
+def _futures():
+    # concurrent.futures is relatively slow to import and it's needed only
+    # by concurrency helpers, so it's imported on first use
+    import concurrent.futures
+    return concurrent.futures
+
+
+PRIORITIES = ('critical', 'normal', 'bulk')
+
+
+def current_priority():
+    return getattr(_local, 'priority', 'normal')
+
+
+@contextmanager
+def priority(name):
+    """Set traffic class (``critical``, ``normal`` or ``bulk``) of
+    requests made by this thread within the block"""
+    if name not in PRIORITIES:
+        raise ValueError('unknown priority: {}'.format(name))
+    previous = current_priority()
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def _bind_context(func):
+    """Make ``func`` run under the current thread's deadline, priority
+    and tracing span in whatever thread it's called from"""
+    current = current_deadline()
+    current_class = current_priority()
+    span = current_span()
+
+    def wrapper(*args, **kwargs):
+        with priority(current_class), activate(span):
+            if current is None:
+                return func(*args, **kwargs)
+            with deadline(current):
+                return func(*args, **kwargs)
+    return wrapper
 
-class Whispir(object):
+
+class TransferStats(object):
+    """Counts bytes before (``*_bytes``) and after (``*_wire_bytes``)
+    compression for request and response bodies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent_bytes = 0
+        self.sent_wire_bytes = 0
+        self.received_bytes = 0
+        self.received_wire_bytes = 0
+
+    def record_request(self, size, wire_size):
+        with self._lock:
+            self.sent_bytes += size
+            self.sent_wire_bytes += wire_size
+
+    def record_response(self, size, wire_size):
+        with self._lock:
+            self.received_bytes += size
+            self.received_wire_bytes += wire_size
+
+    @property
+    def request_ratio(self):
+        return _ratio(self.sent_bytes, self.sent_wire_bytes)
+
+    @property
+    def response_ratio(self):
+        return _ratio(self.received_bytes, self.received_wire_bytes)
+
+
+class CircuitBreaker(object):
+    """Keeps a circuit per endpoint (collection resource).
+
+    A circuit opens when at least ``failure_rate`` of the last
+    ``window_size`` calls (and no less than ``min_calls``) failed with a
+    server or connection error or took longer than ``slow_call_duration``
+    seconds. Calls through an open circuit raise ``CircuitOpenError``
+    straight away. After ``reset_timeout`` seconds up to
+    ``half_open_calls`` probe calls are let through: the circuit closes
+    if they succeed and opens again otherwise.
+    """
+
+    def __init__(self, failure_rate=0.5, window_size=20, min_calls=10,
+                 slow_call_duration=None, reset_timeout=30,
+                 half_open_calls=1):
+        self.failure_rate = failure_rate
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.slow_call_duration = slow_call_duration
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def circuit(self, endpoint):
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.setdefault(
+                    endpoint, Circuit(self, endpoint))
+        return circuit
+
+
+class Circuit(object):
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, breaker, endpoint):
+        self.breaker = breaker
+        self.endpoint = endpoint
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=breaker.window_size)
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        self.acquire()
+        start = time.time()
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            # any failure has to release a half-open probe slot
+            self.record(False)
+            raise
+        slow = self.breaker.slow_call_duration
+        failed = (response.status_code >= 500 or
+                  (slow is not None and time.time() - start > slow))
+        self.record(not failed)
+        return response
+
+    def acquire(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                elapsed = time.time() - self._opened_at
+                if elapsed < self.breaker.reset_timeout:
+                    raise CircuitOpenError(
+                        self.endpoint, self.breaker.reset_timeout - elapsed)
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.breaker.half_open_calls:
+                    raise CircuitOpenError(self.endpoint, 0)
+                self._probes += 1
+
+    def record(self, success):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            calls = len(self._outcomes)
+            if calls >= self.breaker.min_calls:
+                failures = calls - sum(self._outcomes)
+                if failures >= self.breaker.failure_rate * calls:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.time()
+        self._outcomes.clear()
+
+
+class Scheduler(object):
+    """Schedules requests of different traffic classes.
+
+    Requests wait in a queue per traffic class (see ``priority``) until
+    they fit into the rate budget (``rate`` requests per second with
+    bursts up to ``burst``) and the number of requests in flight
+    (``max_concurrency``). Waiting classes are served in proportion to
+    their ``weights``, so critical requests jump ahead of bulk traffic
+    and are guaranteed their share of the budget, while an idle class
+    leaves its share to others.
+    """
+
+    DEFAULT_WEIGHTS = {'critical': 6, 'normal': 3, 'bulk': 1}
+
+    def __init__(self, rate=None, burst=1, max_concurrency=None,
+                 weights=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+        self._queues = {name: deque() for name in self.weights}
+        self._passes = {name: 0.0 for name in self.weights}
+        self._pass = 0.0
+        self._granted = set()
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, priority='normal', timeout=None):
+        """Wait for the turn of a request, returns False on timeout"""
+        ticket = object()
+        expires = None if timeout is None else time.time() + timeout
+        with self._cond:
+            queue = self._queues[priority]
+            if not queue:
+                # a class coming back from idle doesn't get credit for it
+                self._passes[priority] = max(self._passes[priority],
+                                             self._pass)
+            queue.append(ticket)
+            while True:
+                wait = self._dispatch()
+                if ticket in self._granted:
+                    self._granted.remove(ticket)
+                    return True
+                if expires is not None:
+                    remaining = expires - time.time()
+                    if remaining <= 0:
+                        queue.remove(ticket)
+                        self._cond.notify_all()
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _dispatch(self):
+        """Grant as many waiting requests as possible, returns time until
+        the next token is available (if that's what requests wait for)"""
+        granted = False
+        wait = None
+        while True:
+            waiting = [name for name, queue in self._queues.items() if queue]
+            if not waiting:
+                break
+            if (self.max_concurrency is not None and
+                    self._in_flight >= self.max_concurrency):
+                break
+            if self.rate is not None:
+                self._refill()
+                if self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                    break
+                self._tokens -= 1
+            name = min(waiting, key=lambda it: self._passes[it])
+            self._pass = self._passes[name]
+            self._passes[name] += 1.0 / self.weights[name]
+            self._granted.add(self._queues[name].popleft())
+            self._in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class Hedging(object):
+    """Hedges idempotent reads.
+
+    When a read hasn't completed within the ``percentile`` of recent read
+    latencies (``initial_delay`` until ``min_samples`` are collected), a
+    duplicate request is sent and whichever response arrives first is
+    used. Hedged requests are capped to ``max_ratio`` of all reads.
+    """
+
+    def __init__(self, percentile=95, window_size=200, min_samples=20,
+                 initial_delay=0.5, min_delay=0.01, max_ratio=0.1,
+                 max_workers=16):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self._latencies = deque(maxlen=window_size)
+        self._reads = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        self._max_workers = max_workers
+        self._executor = None
+
+    def delay(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+        index = int(len(latencies) * self.percentile / 100.0)
+        return max(latencies[min(index, len(latencies) - 1)], self.min_delay)
+
+    def call(self, func, *args, **kwargs):
+        func = _bind_context(func)
+        with self._lock:
+            self._reads += 1
+
+        executor = self._get_executor()
+        start = time.time()
+        first = executor.submit(func, *args, **kwargs)
+        done, _ = _futures().wait([first], timeout=self.delay())
+        if done or not self._allow_hedge():
+            return self._result(first, start)
+
+        second = executor.submit(func, *args, **kwargs)
+        pending = [first, second]
+        while True:
+            done, _ = _futures().wait(
+                pending, return_when=_futures().FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None or not pending:
+                    return self._result(future, start)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = _futures().ThreadPoolExecutor(
+                        max_workers=self._max_workers)
+        return self._executor
+
+    def _allow_hedge(self):
+        with self._lock:
+            if self._hedges < self.max_ratio * self._reads:
+                self._hedges += 1
+                return True
+            return False
+
+    def _result(self, future, start):
+        result = future.result()
+        with self._lock:
+            self._latencies.append(time.time() - start)
+        return result
+
+
+class BaseWhispir(object):
+    """Collections and background sending on top of ``request``, which
+    subclasses implement along with ``url``"""
+
+    def __init__(self, page_size=20, hedging=None, tracer=None):
+        self.page_size = page_size
+        self.hedging = hedging
+        self.tracer = tracer
+        self._send_queue = None
+
+    # collections
+    @_lazy
+    def workspaces(self):
+        return Workspaces(self)
+
+    @_lazy
+    def messages(self):
+        return Messages(self)
+
+    @_lazy
+    def templates(self):
+        return Templates(self)
+
+    @_lazy
+    def response_rules(self):
+        return ResponseRules(self)
+
+    @_lazy
+    def contacts(self):
+        return Contacts(self)
+
+    @_lazy
+    def apps(self):
+        return Apps(self)
+
+    def url(self, path):
+        raise NotImplementedError
+
+    def request(self, method, path, timeout=None, **kwargs):
+        raise NotImplementedError
+
+    deadline = staticmethod(deadline)
+    priority = staticmethod(priority)
+
+    def send_queue(self, **options):
+        """Create (or return already created) background send queue used by
+        ``enqueue``. ``options`` are passed to ``SendQueue``."""
+        if self._send_queue is None:
+            self._send_queue = SendQueue(self.messages, **options)
+        return self._send_queue
+
+    def enqueue(self, timeout=None, **payload):
+        return self.send_queue().enqueue(timeout=timeout, **payload)
+
+    def flush(self):
+        if self._send_queue:
+            self._send_queue.flush()
+
+    def close(self):
+        if self._send_queue:
+            self._send_queue.close()
+
+
+class Whispir(BaseWhispir):
 
     def __init__(self, username, password, api_key, region='us', base_url=None,
-                 page_size=20, retry=DEFAULT_RETRY):
+                 page_size=20, retry=DEFAULT_RETRY,
+                 transport=RequestsTransport, compress=False,
+                 compress_min_size=1024, circuit_breaker=None,
+                 timeout=DEFAULT_TIMEOUT, hedging=None, quota=None,
+                 scheduler=None, tracer=None):
         assert region or base_url, \
             'either region or base_url has to be defined'
+        super(Whispir, self).__init__(page_size, hedging, tracer)
         if not base_url:
             base_url = 'https://api.{region}.whispir.com'.format(region=region)
         self._base_url = base_url
-        self.page_size = page_size
-        self._session = Session()
-        self._session.auth = WhispirAuth(api_key, username, password)
-        adapter = HTTPAdapter(max_retries=retry)
-        self._session.mount('http://', adapter)
-        self._session.mount('https://', adapter)
-        self._session.headers.update({
-            'User-Agent': 'whispyr/{}'.format(__version__)
-        })
-        # collections
-        self.workspaces = Workspaces(self)
-        self.messages = Messages(self)
-        self.templates = Templates(self)
-        self.response_rules = ResponseRules(self)
-        self.contacts = Contacts(self)
-        self.apps = Apps(self)
-
-    def request(self, method, path, **kwargs):
-        url = urljoin(self._base_url, path)
-        response = self._session.request(method, url, **kwargs)
-        if response.ok:
+        self._url_prefix = urljoin(base_url, '.')
+        self.compress = compress
+        self.compress_min_size = compress_min_size
+        self.stats = TransferStats()
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.quota = quota
+        self.scheduler = scheduler
+        self._api_key = api_key
+        auth = WhispirAuth(api_key, username, password)
+        headers = {
+            'User-Agent': 'whispyr/{}'.format(__version__),
+            'Accept-Encoding': ACCEPT_ENCODING
+        }
+        self._transport = transport(auth, retry, headers)
+
+    def url(self, path):
+        if path[:1] in ('/', '.') or '://' in path:
+            return urljoin(self._base_url, path)
+        return self._url_prefix + path
+
+    def request(self, method, path, timeout=None, **kwargs):
+        if not self.tracer:
+            return self._request(None, method, path, timeout, **kwargs)
+        with self.tracer.span('whispir.request', method=method.upper(),
+                              path=path) as span:
+            return self._request(span, method, path, timeout, **kwargs)
+
+    def _request(self, span, method, path, timeout=None, **kwargs):
+        url = self.url(path)
+        timeout = timeout or self.timeout
+        deadline = current_deadline()
+        if deadline:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded()
+            timeout = _cap_timeout(timeout, remaining)
+        kwargs['timeout'] = timeout
+        if self.quota:
+            self.quota.acquire(self._api_key, current_priority())
+        if 'json' in kwargs:
+            kwargs = self._encode_body(**kwargs)
+        try:
+            response = self._schedule(method, path, url, deadline, **kwargs)
+        except (CircuitOpenError, DeadlineExceeded):
+            # refused before anything was sent
+            if self.quota:
+                self.quota.record(self._api_key, -1)
+            raise
+        if self.quota and _retries(response):
+            self.quota.record(self._api_key, _retries(response))
+        self.stats.record_response(len(response.content),
+                                   _wire_size(response))
+        if span:
+            span.set_attribute('status', response.status_code)
+            span.set_attribute('request_bytes', len(kwargs.get('data') or b''))
+            span.set_attribute('response_bytes', _wire_size(response))
+            span.set_attribute('retries', sum(
+                1 for event in span.events if event[0] == 'retry'))
+        if response.status_code < 400:
             return self._maybe_return_json(response)
         else:
-            if 400 <= response.status_code < 500:
+            if self.quota and _over_daily_quota(response):
+                self.quota.exhausted(self._api_key)
+            if response.status_code < 500:
                 error = ClientError
-            elif 500 <= self.status_code < 600:
+            else:
                 error = ServerError
 
             raise error(response)
 
+    def _schedule(self, method, path, url, deadline, **kwargs):
+        if not self.scheduler:
+            return self._send(method, path, url, **kwargs)
+        wait = deadline.remaining() if deadline else None
+        if not self.scheduler.acquire(current_priority(), wait):
+            raise DeadlineExceeded()
+        try:
+            return self._send(method, path, url, **kwargs)
+        finally:
+            self.scheduler.release()
+
+    def _send(self, method, path, url, **kwargs):
+        if self.circuit_breaker:
+            circuit = self.circuit_breaker.circuit(_endpoint(path))
+            return circuit.call(self._transport.request,
+                                method, url, **kwargs)
+        return self._transport.request(method, url, **kwargs)
+
+    def close(self):
+        super(Whispir, self).close()
+        self._transport.close()
+
+    def _encode_body(self, json=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+        body = _dumps(json).encode('utf-8')
+        wire_body = body
+        if self.compress and len(body) >= self.compress_min_size:
+            wire_body = _gzip(body)
+            headers['Content-Encoding'] = 'gzip'
+        self.stats.record_request(len(body), len(wire_body))
+        return dict(kwargs, data=wire_body, headers=headers)
+
     def _maybe_return_json(self, response):
         if not response.content:
             return
@@ -122,6 +738,13 @@ class Whispir(object):
 
 class Collection(object):
 
+    # whether offset/limit params select an arbitrary window of items
+    offset_paging = True
+    # query parameter for server side field selection (if supported)
+    fields_param = None
+    # {(field, op): Param} comparisons of list filters whispir can apply
+    query_params = {}
+
     def __init__(self, whispir, base_container=None):
         self.whispir = whispir
         class_name = self.__class__.__name__
@@ -129,20 +752,30 @@ class Collection(object):
         type_name = (getattr(self, 'type_name', False) or
                      _singularize(self.name))
         self.vnd_type = 'application/vnd.whispir.{}-v1+json'.format(type_name)
+        self._headers = {
+            'Content-Type': self.vnd_type,
+            'Accept': self.vnd_type
+        }
         self.list_name = getattr(self, 'list_name', self.name)
         self.container = (getattr(self, 'container', False) or
                           globals()[_singularize(class_name)])
         self.resource = (getattr(self, 'resource', False) or self.name)
         self.base_container = base_container
 
-        class ContainerProxy(self.container):
+    def __getattr__(self, name):
+        # container proxy (e.g. messages.Message) is built on first access
+        container = self.__dict__.get('container')
+        if container is None or name != container.__name__:
+            raise AttributeError(name)
+
+        class ContainerProxy(container):
             collection = self
-            container = self.container
 
-            def __new__(self, *args, **kwargs):
-                return self.container(self.collection, *args, **kwargs)
+            def __new__(cls, *args, **kwargs):
+                return container(cls.collection, *args, **kwargs)
 
-        setattr(self, self.container.__name__, ContainerProxy)
+        setattr(self, name, ContainerProxy)
+        return ContainerProxy
 
     def path(self, id=None):
         path = self.resource
@@ -155,26 +788,41 @@ class Collection(object):
         return path
 
     def request(self, method, path, headers=None, **kwargs):
-        headers = kwargs.pop('headers', {})
-        collection_type = self.vnd_type
-        headers.update({
-            'Content-Type': collection_type,
-            'Accept': collection_type
-        })
+        if headers:
+            headers = dict(headers, **self._headers)
+        else:
+            headers = self._headers
         return self.whispir.request(method, path, headers=headers, **kwargs)
 
-    def _containerize(self, item):
+    def _span(self, operation, **attributes):
+        tracer = self.whispir.tracer
+        if tracer is None:
+            return _NO_SPAN
+        attributes = {k: v for k, v in attributes.items() if v is not None}
+        return tracer.span('{}.{}'.format(self.name, operation),
+                           collection=self.name, **attributes)
+
+    def _containerize(self, item, fields=None):
+        if fields is not None:
+            item = _project(item, fields)
         return self.container(self, **item)
 
+    def _fields_params(self, fields):
+        if fields is not None and self.fields_param:
+            return {self.fields_param: ','.join(fields)}
+        return {}
+
     def create(self, **kwargs):
         path = self.path()
-        item = self.request('post', path, json=kwargs)
+        with self._span('create', path=path):
+            item = self.request('post', path, json=kwargs)
         return self._containerize(item)
 
-    def show(self, id):
+    def show(self, id, fields=None):
         path = self.path(id)
-        item = self.request('get', path)
-        return self._containerize(item)
+        with self._span('show', path=path):
+            item = self._get(path, params=self._fields_params(fields))
+        return self._containerize(item, fields)
 
     def _get_page(self, path, **kwargs):
         result = self._try_get(path, kwargs)
@@ -183,15 +831,15 @@ class Collection(object):
     def _page_items(self, response):
         return response.get(self.list_name, [])
 
-    def list(self, **kwargs):
-        path = self.path()
-
-        list_items = self._list
-        if 'offset' in kwargs or 'limit' in kwargs:
-            list_items = self._get_page
-
-        for item in list_items(path, **kwargs):
-            yield self._containerize(item)
+    def list(self, fields=None, where=None, **kwargs):
+        """List items as a ``ResultSet``. ``where`` expression (see
+        ``whispyr.query``) is pushed down as query parameters where
+        whispir supports it and evaluated on raw items otherwise."""
+        kwargs.update(self._fields_params(fields))
+        if where is not None:
+            query, where = plan(where, self.query_params)
+            kwargs.update(query)
+        return ResultSet(self, self.path(), kwargs, fields, where)
 
     def _list(self, path, **kwargs):
         kwargs['limit'] = self.whispir.page_size
@@ -208,30 +856,109 @@ class Collection(object):
             if not link:
                 return
 
-            uri = urlparse(link['uri'])
-            query = dict(parse_qsl(uri.query))
+            query = _page_params(link['uri'])
             kwargs['limit'] = query['limit']
             kwargs['offset'] = query['offset']
 
+    def _get(self, path, **kwargs):
+        hedging = self.whispir.hedging
+        if hedging:
+            return hedging.call(self.request, 'get', path, **kwargs)
+        return self.request('get', path, **kwargs)
+
     def _try_get(self, path, params):
-        try:
-            return self.request('get', path, params=params)
-        except (ClientError, JSONDecodeError) as e:
-            if e.response.status_code == 404:
-                return {}
-            raise
+        with self._span('page', path=path, offset=params.get('offset'),
+                        limit=params.get('limit')) as span:
+            try:
+                result = self._get(path, params=params)
+            except (ClientError, JSONDecodeError) as e:
+                if e.response.status_code != 404:
+                    raise
+                result = {}
+            if span:
+                span.set_attribute('items', len(self._page_items(result)))
+            return result
 
     def update(self, id, **kwargs):
         path = self.path(id)
-        self.request('put', path, json=kwargs)
+        with self._span('update', path=path):
+            self.request('put', path, json=kwargs)
 
     def delete(self, id):
         path = self.path(id)
-        self.request('delete', path)
+        with self._span('delete', path=path):
+            self.request('delete', path)
+
+    def delete_many(self, ids, where=None, max_workers=8, rate=None):
+        """Delete items concurrently.
+
+        ``ids`` may contain IDs or containers, e.g. a ``list()`` result
+        set, optionally filtered by ``where``, an expression (see
+        ``whispyr.query``) or a predicate on containers.
+        Only IDs of a listing are kept while it's streamed and deletion
+        starts after it's complete, so deleting doesn't shift the pages
+        being listed. At most ``max_workers`` requests run at once and
+        at most ``rate`` per second (if given). Returns ``{id: error}``
+        in order of ``ids`` with None for deleted items, failures don't
+        stop the rest.
+        """
+        if isinstance(where, Expression):
+            expression = where
+
+            def where(item):
+                return expression.matches(item.data)
+
+        targets = ((_item_id(item), {}) for item in ids
+                   if where is None or where(item))
+        if isinstance(ids, ResultSet):
+            targets = list(targets)
+        with self._span('delete_many'):
+            return self._bulk(lambda id, _: self.delete(id), targets,
+                              max_workers, rate)
+
+    def update_many(self, items, max_workers=8, rate=None):
+        """Update items concurrently. ``items`` is a mapping or pairs of
+        ``(id, fields)`` where ``id`` may be a container. Concurrency,
+        rate and results are the same as of ``delete_many``."""
+        if hasattr(items, 'items'):
+            items = items.items()
+        targets = ((_item_id(id), fields) for id, fields in items)
+        with self._span('update_many'):
+            return self._bulk(lambda id, fields: self.update(id, **fields),
+                              targets, max_workers, rate)
+
+    def _bulk(self, action, targets, max_workers, rate):
+        limiter = RateLimiter(rate) if rate else None
+
+        @_bind_context
+        def run(id, args):
+            if limiter:
+                limiter.acquire()
+            try:
+                action(id, args)
+            except (WhispirError, RequestException) as e:
+                return e
+
+        results = OrderedDict()
+        pending = deque()
+        futures_module = _futures()
+        with futures_module.ThreadPoolExecutor(max_workers) as executor:
+            for id, args in targets:
+                results[id] = None
+                pending.append((id, executor.submit(run, id, args)))
+                # keep a bounded number of submitted items while streaming
+                if len(pending) >= 2 * max_workers:
+                    id, future = pending.popleft()
+                    results[id] = future.result()
+            for id, future in pending:
+                results[id] = future.result()
+        return results
 
 
 class Nonpaginatable(object):
 
+    offset_paging = False
+
     def _list(self, path, **kwargs):
         return self._get_page(path, **kwargs)
 
@@ -258,11 +985,120 @@ class Limitless(object):
     """This is a hack for broken whispir.io pagination when there's
     only option to get list of all items is to pass limit=0"""
 
+    offset_paging = False
+
     def _list(self, path, **kwargs):
         kwargs['limit'] = 0
         return self._get_page(path, **kwargs)
 
 
+class ResultSet(object):
+    """Lazy view of a collection listing.
+
+    Iterating a result set pages through all items (like a generator, it
+    can be iterated only once). Slicing (``items[10000:10100]``) fetches
+    only the requested window through offset/limit requests, ``chunks``
+    yields lists of items and ``count`` uses the total reported by
+    whispir where available. Items not matching the ``where`` expression
+    are dropped as pages arrive, before containers are built (windows
+    and counts are then computed client side).
+    """
+
+    _TOTAL_RE = re.compile(r'of\s+(\d+)')
+
+    def __init__(self, collection, path, params, fields=None, where=None):
+        self.collection = collection
+        self.path = path
+        self.params = params
+        self.fields = fields
+        self.where = where
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = self._items()
+        return next(self._iterator)
+
+    next = __next__
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.start, key.stop, key.step
+            if (start or 0) < 0 or (stop or 0) < 0:
+                start, stop, step = key.indices(self.count())
+            return list(self._window(start or 0, stop))[::step]
+
+        if key < 0:
+            key += self.count()
+        items = list(self._window(key, key + 1))
+        if not items:
+            raise IndexError('result set index out of range')
+        return items[0]
+
+    def chunks(self, size):
+        return _chunked(self._items(), size)
+
+    def to_batches(self, columns=None, batch_size=None, backend=None,
+                   schema=None):
+        """Export items into columnar batches, see
+        ``whispyr.export.iter_batches``"""
+        from .export import iter_batches
+        return iter_batches(self, columns, batch_size, backend, schema)
+
+    def count(self):
+        collection = self.collection
+        if collection.offset_paging and self.where is None:
+            params = dict(self.params, offset=0, limit=1)
+            result = collection._try_get(self.path, params)
+            match = self._TOTAL_RE.search(result.get('status', ''))
+            if match:
+                return int(match.group(1))
+        return sum(1 for _ in self._raw_items())
+
+    def _raw_items(self):
+        collection = self.collection
+        params = self.params
+        if 'offset' in params or 'limit' in params:
+            items = collection._get_page(self.path, **params)
+        else:
+            items = collection._list(self.path, **params)
+        if self.where is not None:
+            items = (item for item in items if self.where.matches(item))
+        tracer = collection.whispir.tracer
+        if tracer is None:
+            return items
+        return tracer.trace_iter('{}.list'.format(collection.name), items,
+                                 collection=collection.name, path=self.path)
+
+    def _items(self):
+        for item in self._raw_items():
+            yield self.collection._containerize(item, self.fields)
+
+    def _window(self, start, stop):
+        collection = self.collection
+        if not collection.offset_paging or self.where is not None:
+            for item in itertools.islice(self._items(), start, stop):
+                yield item
+            return
+
+        page_size = collection.whispir.page_size
+        offset = start
+        while stop is None or offset < stop:
+            limit = page_size
+            if stop is not None:
+                limit = min(limit, stop - offset)
+            params = dict(self.params, offset=offset, limit=limit)
+            items = collection._get_page(self.path, **params)
+            for item in items:
+                yield collection._containerize(item, self.fields)
+            if len(items) < limit:
+                return
+            offset += limit
+
+
 class Container(UserDict, object):
 
     def __init__(self, collection, id=None, **kwargs):
@@ -285,8 +1121,11 @@ class Container(UserDict, object):
 
     @staticmethod
     def id_from_uri(url):
-        path = urlparse(url).path
-        return path.split('/')[-1]
+        # whispir URIs are plain https://host/resource/id paths, so skip
+        # full URL parsing unless there's a query or fragment to strip
+        if '?' in url or '#' in url:
+            url = urlparse(url).path
+        return url.rpartition('/')[2]
 
     def path(self):
         return self.collection.path(self.id())
@@ -296,11 +1135,54 @@ class Container(UserDict, object):
 
 
 class Workspaces(Nonpaginatable, Collection):
-    pass
+
+    def fan_out(self, collection, action='list', workspaces=None,
+                max_workers=8, **kwargs):
+        """Run the same collection action across workspaces concurrently.
+
+        Yields ``(workspace_id, item)`` tuples as soon as every workspace's
+        action completes, so the whole run takes roughly as long as the
+        slowest workspace. ``workspaces`` may contain ``Workspace``
+        containers or IDs and defaults to all available workspaces.
+        """
+        if workspaces is None:
+            workspaces = self.list()
+
+        @_bind_context
+        def run(workspace):
+            if not isinstance(workspace, Workspace):
+                workspace = self.Workspace(id=workspace)
+            method = getattr(getattr(workspace, collection), action)
+            return workspace.id(), list(method(**kwargs))
+
+        futures_module = _futures()
+        with futures_module.ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(run, ws) for ws in workspaces]
+            try:
+                for future in futures_module.as_completed(futures):
+                    workspace_id, items = future.result()
+                    for item in items:
+                        yield workspace_id, item
+            finally:
+                for future in futures:
+                    future.cancel()
 
 
 class Messages(Streamable, Collection):
 
+    # search criteria match by minutes in the account's timezone, so the
+    # range is widened by a day and createdTime is checked client side
+    query_params = {
+        ('createdTime', 'ge'): Param(
+            'criteriaFromDate', format=lambda ms: _criteria_date(ms, -1)),
+        ('createdTime', 'gt'): Param(
+            'criteriaFromDate', format=lambda ms: _criteria_date(ms, -1)),
+        ('createdTime', 'le'): Param(
+            'criteriaToDate', format=lambda ms: _criteria_date(ms, 1)),
+        ('createdTime', 'lt'): Param(
+            'criteriaToDate', format=lambda ms: _criteria_date(ms, 1)),
+    }
+
     def create(self, **kwargs):
         try:
             super(Messages, self).create(**kwargs)
@@ -312,12 +1194,402 @@ class Messages(Streamable, Collection):
 
     send = create
 
+    def batcher(self, max_recipients=100, max_delay=0.5):
+        return MessageBatcher(self, max_recipients, max_delay)
+
+    def send_many(self, payloads, max_recipients=100):
+        """Send messages collapsing identical payloads into
+        multi-recipient messages. Returns a message for every payload."""
+        with self.batcher(max_recipients, max_delay=None) as batcher:
+            futures = [batcher.submit(**payload) for payload in payloads]
+        return [future.result() for future in futures]
+
+    def watch(self, messages, **options):
+        """Watch delivery statuses of ``messages`` (containers or ids),
+        see ``StatusWatcher``"""
+        messages = [self.Message(id=m) if isinstance(m, string_types) else m
+                    for m in messages]
+        return StatusWatcher(messages, **options)
+
+
+class MessageBatcher(object):
+    """Groups messages with identical payloads (everything but ``to``)
+    into multi-recipient messages.
+
+    A group is sent once it has ``max_recipients`` recipients (from the
+    submitting thread) or ``max_delay`` seconds after its first message
+    (from a background thread, unless ``max_delay`` is None), whichever
+    comes first. ``submit`` returns a future resolved with the sent
+    message.
+    """
+
+    def __init__(self, messages, max_recipients=100, max_delay=0.5):
+        self.messages = messages
+        self.max_recipients = max_recipients
+        self.max_delay = max_delay
+        self._batches = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        if max_delay is not None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def submit(self, to, **payload):
+        future = _futures().Future()
+        recipients = to.split(';')
+        key = json.dumps(payload, sort_keys=True)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('batcher is closed')
+            ready = []
+            batch = self._batches.get(key)
+            if (batch and len(batch.recipients) + len(recipients) >
+                    self.max_recipients):
+                ready.append(self._batches.pop(key))
+                batch = None
+            if batch is None:
+                batch = self._batches[key] = _MessageBatch(
+                    payload, self._deadline())
+                self._cond.notify()
+            batch.add(recipients, future)
+            if len(batch.recipients) >= self.max_recipients:
+                ready.append(self._batches.pop(key))
+
+        for batch in ready:
+            self._send(batch)
+        return future
+
+    def flush(self):
+        with self._cond:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            self._send(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _deadline(self):
+        if self.max_delay is not None:
+            return time.time() + self.max_delay
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batches = self._wait_due()
+            if batches is None:
+                return
+            for batch in batches:
+                self._send(batch)
+
+    def _wait_due(self):
+        while not self._closed:
+            now = time.time()
+            due = [key for key, batch in self._batches.items()
+                   if batch.deadline <= now]
+            if due:
+                return [self._batches.pop(key) for key in due]
+            timeout = None
+            if self._batches:
+                timeout = min(batch.deadline
+                              for batch in self._batches.values()) - now
+            self._cond.wait(timeout)
+
+    def _send(self, batch):
+        try:
+            message = self.messages.send(
+                to=';'.join(batch.recipients), **batch.payload)
+        except Exception as e:
+            for future in batch.futures:
+                future.set_exception(e)
+        else:
+            for future in batch.futures:
+                future.set_result(message)
+
+
+class RateLimiter(object):
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second
+    with bursts up to ``burst``"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class SendQueue(object):
+    """Background message sending.
+
+    ``enqueue`` puts a message into a bounded queue (blocking when it's
+    full) and returns a future resolved with the sent message. ``workers``
+    threads drain the queue collapsing identical payloads queued within
+    ``max_delay`` seconds into multi-recipient messages, sending at most
+    ``rate`` messages per second and retrying server and connection
+    errors up to ``retries`` times.
+    """
+
+    _STOP = object()
+
+    def __init__(self, messages, workers=4, maxsize=1000, max_recipients=100,
+                 max_delay=0.1, rate=None, retries=3, backoff=0.5):
+        self.messages = messages
+        self.max_recipients = max_recipients
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self._limiter = RateLimiter(rate) if rate else None
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+        self._workers = []
+        for _ in range(workers):
+            worker = threading.Thread(target=self._run)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def enqueue(self, timeout=None, **payload):
+        if self._closed:
+            raise RuntimeError('send queue is closed')
+        if not isinstance(payload.get('to'), string_types):
+            raise ValueError('messages need recipients as a string: '
+                             '{!r}'.format(payload.get('to')))
+        future = _futures().Future()
+        self._queue.put((payload, future), timeout=timeout)
+        return future
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(self._STOP)
+        for worker in self._workers:
+            worker.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            items, stop = self._next_items()
+            try:
+                for batch in self._batches(items):
+                    self._send(batch)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _batches(self, items):
+        batches = OrderedDict()
+        for payload, future in items:
+            payload = dict(payload)
+            recipients = payload.pop('to').split(';')
+            key = json.dumps(payload, sort_keys=True)
+            batch = batches.get(key)
+            if (batch and len(batch.recipients) + len(recipients) >
+                    self.max_recipients):
+                yield batches.pop(key)
+                batch = None
+            if batch is None:
+                batch = batches[key] = _MessageBatch(payload, None)
+            batch.add(recipients, future)
+        for batch in batches.values():
+            yield batch
+
+    def _next_items(self):
+        items = []
+        recipients = 0
+        deadline = time.time() + self.max_delay
+        while recipients < self.max_recipients:
+            try:
+                if items:
+                    timeout = deadline - time.time()
+                    item = self._queue.get(timeout=max(timeout, 0))
+                else:
+                    item = self._queue.get()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.task_done()
+                return items, True
+            items.append(item)
+            recipients += item[0]['to'].count(';') + 1
+        return items, False
+
+    def _send(self, batch):
+        for attempt in range(self.retries + 1):
+            if self._limiter:
+                self._limiter.acquire()
+            try:
+                message = self.messages.send(
+                    to=';'.join(batch.recipients), **batch.payload)
+            except (ServerError, RequestException) as e:
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+                    continue
+                error = e
+            except Exception as e:
+                error = e
+            else:
+                for future in batch.futures:
+                    future.set_result(message)
+                return
+
+            for future in batch.futures:
+                future.set_exception(error)
+            return
+
+
+class _MessageBatch(object):
+
+    def __init__(self, payload, deadline):
+        self.payload = payload
+        self.deadline = deadline
+        self.recipients = []
+        self.futures = []
+
+    def add(self, recipients, future):
+        self.recipients.extend(recipients)
+        self.futures.append(future)
+
 
 class MessageStatuses(Limitless, Collection):
 
     list_name = 'messageStatuses'
     resource = 'messagestatus'
 
+    def watch(self, **options):
+        """Yield ``(previous, status)`` pairs of recipient statuses of the
+        message as they change, see ``StatusWatcher``"""
+        for _, previous, status in StatusWatcher([self.base_container],
+                                                 **options):
+            yield previous, status
+
+
+class StatusWatcher(object):
+    """Polls detailed delivery statuses of messages and yields
+    ``(message, previous, status)`` for every recipient whose status
+    changed since the previous poll (``previous`` is None for new
+    recipients).
+
+    Every message is polled every ``min_interval`` seconds while its
+    statuses change, the interval grows by ``backoff`` up to
+    ``max_interval`` as they settle. A message is no longer polled once
+    all its recipients reached one of ``terminal`` states (or of
+    ``channel_terminal`` states of the channel, channel -> states);
+    watching stops when no messages are left or after ``timeout``
+    seconds.
+    """
+
+    TERMINAL_STATES = frozenset([
+        'DELIVERED', 'READ', 'ACKNOWLEDGED', 'UNDELIVERABLE', 'FAILED',
+        'CANCELLED', 'EXPIRED'
+    ])
+    # whispir doesn't track emails any further
+    CHANNEL_TERMINAL_STATES = {'email': frozenset(['SENT'])}
+
+    def __init__(self, messages, min_interval=1, max_interval=60, backoff=2,
+                 timeout=None, terminal=None, channel_terminal=None,
+                 clock=time.time, sleep=time.sleep):
+        self.messages = list(messages)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.terminal = frozenset(terminal or self.TERMINAL_STATES)
+        if channel_terminal is None:
+            channel_terminal = self.CHANNEL_TERMINAL_STATES
+        self.channel_terminal = {channel: frozenset(states) for
+                                 channel, states in channel_terminal.items()}
+        self._clock = clock
+        self._sleep = sleep
+
+    def __iter__(self):
+        now = self._clock()
+        expires = None if self.timeout is None else now + self.timeout
+        watches = [_StatusWatch(message, now, self.min_interval)
+                   for message in self.messages]
+        while watches:
+            watch = min(watches, key=lambda it: it.next_poll)
+            if expires is not None and watch.next_poll >= expires:
+                return
+            wait = watch.next_poll - self._clock()
+            if wait > 0:
+                self._sleep(wait)
+
+            changes = self._poll(watch)
+            for previous, status in changes:
+                yield watch.message, previous, status
+
+            if watch.snapshot and all(self._settled(state) for state
+                                      in watch.snapshot.values()):
+                watches.remove(watch)
+                continue
+            if changes:
+                watch.interval = self.min_interval
+            else:
+                watch.interval = min(watch.interval * self.backoff,
+                                     self.max_interval)
+            watch.next_poll = self._clock() + watch.interval
+
+    def _poll(self, watch):
+        statuses = watch.message.statuses
+        changes = []
+        for item in statuses._list(statuses.path(), view='detailed'):
+            recipient = item.get('name')
+            state = tuple((it.get('type'), it.get('status'))
+                          for it in item.get('status', []))
+            if watch.snapshot.get(recipient) == state:
+                continue
+            status = statuses._containerize(item)
+            changes.append((watch.statuses.get(recipient), status))
+            watch.snapshot[recipient] = state
+            watch.statuses[recipient] = status
+        return changes
+
+    def _settled(self, state):
+        # channels without status weren't used for the recipient
+        return all(not status or status.upper() in self.terminal or
+                   status.upper() in self.channel_terminal.get(channel, ())
+                   for channel, status in state)
+
+
+class _StatusWatch(object):
+
+    def __init__(self, message, next_poll, interval):
+        self.message = message
+        self.next_poll = next_poll
+        self.interval = interval
+        self.snapshot = {}
+        self.statuses = {}
+
 
 class MessageResponses(Collection):
     pass
@@ -326,13 +1598,63 @@ class MessageResponses(Collection):
 class Templates(Collection):
     list_name = 'messagetemplates'
 
+    def __init__(self, *args, **kwargs):
+        super(Templates, self).__init__(*args, **kwargs)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def get(self, id):
+        """Return template by ID, fetching it only once"""
+        template = self._cache.get(id)
+        if template is None:
+            template = self.show(id)
+            with self._cache_lock:
+                template = self._cache.setdefault(id, template)
+        return template
+
+    def invalidate(self, id=None):
+        with self._cache_lock:
+            if id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(id, None)
+
+    def render(self, id, **variables):
+        return self.get(id).render(**variables)
+
+    def render_many(self, id, recipients):
+        """Materialise message payloads for a stream of recipients.
+
+        Every recipient is a mapping of template variables; its ``to`` key
+        (if any) becomes the message recipient.
+        """
+        render = self.get(id).compile()
+        for variables in recipients:
+            yield render(variables)
+
+    def update(self, id, **kwargs):
+        super(Templates, self).update(id, **kwargs)
+        self.invalidate(id)
+
+    def delete(self, id):
+        super(Templates, self).delete(id)
+        self.invalidate(id)
+
 
 class ResponseRules(Nonpaginatable, Collection):
     list_name = 'responseRules'
 
 
 class Contacts(Collection):
-    pass
+
+    # whispir searches contacts by these fields, matches are checked
+    # client side as search isn't necessarily exact
+    query_params = {
+        (field, 'eq'): Param(field) for field in [
+            'firstName', 'lastName', 'status', 'workEmailAddress1',
+            'workMobilePhone1'
+        ]
+    }
 
 
 class Apps(Collection):
@@ -340,20 +1662,37 @@ class Apps(Collection):
 
 
 class Workspace(Container):
-    def __init__(self, *args, **kwargs):
-        super(Workspace, self).__init__(*args, **kwargs)
-        self.messages = Messages(self.whispir, self)
-        self.templates = Templates(self.whispir, self)
-        self.response_rules = ResponseRules(self.whispir, self)
-        self.contacts = Contacts(self.whispir, self)
-        self.apps = Apps(self.whispir, self)
+
+    @_lazy
+    def messages(self):
+        return Messages(self.whispir, self)
+
+    @_lazy
+    def templates(self):
+        return Templates(self.whispir, self)
+
+    @_lazy
+    def response_rules(self):
+        return ResponseRules(self.whispir, self)
+
+    @_lazy
+    def contacts(self):
+        return Contacts(self.whispir, self)
+
+    @_lazy
+    def apps(self):
+        return Apps(self.whispir, self)
 
 
 class Message(Container):
-    def __init__(self, *args, **kwargs):
-        super(Message, self).__init__(*args, **kwargs)
-        self.statuses = MessageStatuses(self.whispir, self)
-        self.responses = MessageResponses(self.whispir, self)
+
+    @_lazy
+    def statuses(self):
+        return MessageStatuses(self.whispir, self)
+
+    @_lazy
+    def responses(self):
+        return MessageResponses(self.whispir, self)
 
 
 class MessageStatus(Container):
@@ -365,7 +1704,33 @@ class MessageResponse(Container):
 
 
 class Template(Container):
-    pass
+
+    # template attributes which are not part of a message
+    metadata = frozenset(['id', 'link', 'messageTemplateName',
+                          'messageTemplateDescription'])
+
+    _compiled = None
+
+    def compile(self):
+        """Precompile ``@@placeholder@@`` substitution into a function
+        building message payloads from a mapping of variables.
+        Placeholders without a variable are left for whispir to fill."""
+        if self._compiled is None:
+            message = {k: v for k, v in self.items()
+                       if k not in self.metadata}
+            render = _compile_template(message)
+
+            def render_message(variables):
+                payload = render(variables)
+                if 'to' in variables:
+                    payload['to'] = variables['to']
+                return payload
+
+            self._compiled = render_message
+        return self._compiled
+
+    def render(self, **variables):
+        return self.compile()(variables)
 
 
 class ResponseRule(Container):
@@ -389,7 +1754,138 @@ def _singularize(string):
     return string
 
 
+_PLACEHOLDER_RE = re.compile(r'@@(\w+)@@')
+
+
+def _compile_template(value):
+    if isinstance(value, dict):
+        fields = [(k, _compile_template(v)) for k, v in value.items()]
+        return lambda variables: {k: f(variables) for k, f in fields}
+
+    if isinstance(value, list):
+        items = [_compile_template(v) for v in value]
+        return lambda variables: [f(variables) for f in items]
+
+    if isinstance(value, string_types) and '@@' in value:
+        parts = _PLACEHOLDER_RE.split(value)
+        literals, names = parts[::2], parts[1::2]
+
+        def substitute(variables):
+            result = [literals[0]]
+            for name, literal in zip(names, literals[1:]):
+                if name in variables:
+                    result.append(text_type(variables[name]))
+                else:
+                    result.append('@@{}@@'.format(name))
+                result.append(literal)
+            return ''.join(result)
+
+        return substitute
+
+    return lambda variables: value
+
+
+def _endpoint(path):
+    # resources and IDs alternate in whispir paths, so the endpoint is the
+    # last resource: workspaces/ID/messages/ID -> messages
+    parts = path.strip('/').split('?')[0].split('/')
+    return parts[(len(parts) - 1) // 2 * 2]
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _project(item, fields):
+    projected = {k: item[k] for k in fields if k in item}
+    if 'id' not in projected:
+        id = _raw_id(item)
+        if id:
+            projected['id'] = id
+    return projected
+
+
+def _raw_id(item):
+    return item.get('id') or Container.id_from_links(item.get('link', []))
+
+
+def _item_id(item):
+    if isinstance(item, Container):
+        return item.id()
+    return item
+
+
+def _retries(response):
+    # retry policy a response was retried with: urllib3 keeps it on raw
+    # responses, transports retrying themselves set it on responses
+    retry = (getattr(response, 'retries', None) or
+             getattr(getattr(response, 'raw', None), 'retries', None))
+    return len(retry.history) if retry is not None else 0
+
+
+def _over_daily_quota(response):
+    mashery_error = response.headers.get('X-Mashery-Error-Code')
+    return mashery_error == 'ERR_403_DEVELOPER_OVER_QPD'
+
+
+def _criteria_date(timestamp_ms, days):
+    timestamp = timestamp_ms / 1000.0 + days * 24 * 60 * 60
+    return time.strftime('%d/%m/%Y %H:%M', time.gmtime(timestamp))
+
+
+def _cap_timeout(timeout, limit):
+    if timeout is None:
+        return limit
+    if isinstance(timeout, tuple):
+        return tuple(_cap_timeout(it, limit) for it in timeout)
+    return min(timeout, limit)
+
+
+def _ratio(size, wire_size):
+    if wire_size:
+        return float(size) / wire_size
+
+
+def _dumps(obj):
+    return json.dumps(obj, allow_nan=False)
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def _wire_size(response):
+    raw = getattr(response, 'raw', None)
+    if hasattr(raw, 'tell'):
+        return raw.tell()
+    downloaded = getattr(response, 'num_bytes_downloaded', None)
+    if downloaded is not None:
+        return downloaded
+    return len(response.content)
+
+
 def _find_link(links, relation, default=None):
-    def is_relation(it):
-        return it['rel'] == relation
-    return next((it for it in links if is_relation(it)), default)
+    for link in links:
+        if link['rel'] == relation:
+            return link
+    return default
+
+
+_PAGE_PARAM_RE = re.compile(r'[?&](limit|offset)=([^&#]*)')
+
+
+def _page_params(uri):
+    params = dict(_PAGE_PARAM_RE.findall(uri))
+    if len(params) < 2:
+        params = dict(parse_qsl(urlparse(uri).query))
+    return params